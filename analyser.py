@@ -0,0 +1,299 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from levels import load_level_data
+from tilemap import TileMap, FIRE, EXIT
+import physics
+from player import CLIPS
+from tiles import COIN_CLIP
+
+# влево/вправо/прыжок; оба направления сразу дают то же, что ни одного
+ACTIONS = [(left, right, jump) for left, right in ((False, False), (True, False), (False, True))
+           for jump in (False, True)]
+FPS = 60
+
+
+class Physics:
+    # движение - тот же physics.step, что у Player; тут только проверки клеток для поиска
+    def __init__(self, tilemap, size):
+        self.tilemap = tilemap
+        self.pixel_height = tilemap.pixel_height
+        self.size = size
+
+    def touches(self, x, y, flag):
+        return bool(self.tilemap.cells(x, y, x + self.size[0], y + self.size[1], flag))
+
+    def valid(self, state):
+        # огонь и падение за карту отнимают жизнь, такие пути не считаются
+        x, y = state[0], state[1]
+        return y - 100 <= self.pixel_height and not self.touches(x, y, FIRE)
+
+    def step(self, state, left, right, jump):
+        return physics.step(self.tilemap, state, self.size, left, right, jump)
+
+
+def components(edges):
+    # Тарьян без рекурсии; компоненты нумеруются так, что преемники всегда имеют меньший номер
+    count = len(edges)
+    index = [0] * count
+    low = [0] * count
+    comp = [-1] * count
+    on_stack = [False] * count
+    stack = []
+    counter = 1
+    found = 0
+    for root in range(count):
+        if index[root]:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            node, i = work[-1]
+            if i < len(edges[node]):
+                work[-1] = (node, i + 1)
+                nxt = edges[node][i]
+                if not index[nxt]:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    work.append((nxt, 0))
+                elif on_stack[nxt]:
+                    low[node] = min(low[node], index[nxt])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    comp[member] = found
+                    if member == node:
+                        break
+                found += 1
+    return comp, found
+
+
+class LevelAnalysis:
+    def __init__(self, name, level):
+        self.name = name
+        self.tilemap = TileMap(level)
+        self.size = CLIPS["idle"][2]
+        self.physics = Physics(self.tilemap, self.size)
+        tile = self.tilemap.tile_size
+        coin_size = COIN_CLIP[2]
+        self.coins = [(x * tile, y * tile, *coin_size) for kind, x, y, gid in level.entities if kind == "coins"]
+        self.keys = [(x * tile, y * tile, tile, tile) for kind, x, y, gid in level.entities if kind == "key"]
+        self.spawn = None
+        if level.spawn is not None:
+            self.spawn = (level.spawn[0] * tile, level.spawn[1] * tile, 0, False, False)
+
+        # всё, что можно задеть, - биты одной маски: монеты, потом ключ (любой) и выход
+        self.key_bit = 1 << len(self.coins)
+        self.exit_bit = self.key_bit << 1
+        self.all_coins = self.key_bit - 1
+
+    def explore(self):
+        # граф всех состояний, достижимых со спавна; номера идут в порядке BFS
+        states = [self.spawn]
+        index = {self.spawn: 0}
+        invalid = set()
+        edges = []
+        step = self.physics.step
+        valid = self.physics.valid
+        i = 0
+        while i < len(states):
+            state = states[i]
+            out = []
+            for action in ACTIONS:
+                nxt = step(state, *action)
+                j = index.get(nxt)
+                if j is None:
+                    if nxt in invalid or not valid(nxt):
+                        invalid.add(nxt)
+                        continue
+                    j = index[nxt] = len(states)
+                    states.append(nxt)
+                if j not in out:
+                    out.append(j)
+            edges.append(out)
+            i += 1
+        return states, edges
+
+    def items(self, state):
+        x, y = state[0], state[1]
+        w, h = self.size
+        mask = 0
+        for i, (cx, cy, cw, ch) in enumerate(self.coins):
+            if x < cx + cw and x + w > cx and y < cy + ch and y + h > cy:
+                mask |= 1 << i
+        for kx, ky, kw, kh in self.keys:
+            if x < kx + kw and x + w > kx and y < ky + kh and y + h > ky:
+                mask |= self.key_bit
+        if self.physics.touches(x, y, EXIT):
+            mask |= self.exit_bit
+        return mask
+
+    def distances(self, start, edges):
+        dist = [-1] * len(edges)
+        parent = [-1] * len(edges)
+        dist[start] = 0
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for nxt in edges[node]:
+                if dist[nxt] < 0:
+                    dist[nxt] = dist[node] + 1
+                    parent[nxt] = node
+                    queue.append(nxt)
+        return dist, parent
+
+    def min_completion(self, edges, masks):
+        # BFS по парам (состояние, есть ли ключ); игра проверяет выход в начале шага, поэтому +1
+        start = (0, bool(masks[0] & self.key_bit))
+        seen = {start}
+        queue = deque([(start, 0)])
+        while queue:
+            (node, key), ticks = queue.popleft()
+            if key and masks[node] & self.exit_bit:
+                return ticks + 1
+            for nxt in edges[node]:
+                nxt = (nxt, key or bool(masks[nxt] & self.key_bit))
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append((nxt, ticks + 1))
+        return None
+
+    def full_clear(self, edges, masks, coins):
+        # жадно идём к ближайшей цели, но только туда, откуда ещё можно добрать остальное и выйти;
+        # это оценка сверху, а не оптимум
+        comp, count = components(edges)
+        members = [[] for _ in range(count)]
+        for node, c in enumerate(comp):
+            members[c].append(node)
+        reach = [0] * count
+        key_then_exit = [False] * count
+        for c in range(count):
+            for node in members[c]:
+                reach[c] |= masks[node]
+                for nxt in edges[node]:
+                    if comp[nxt] != c:
+                        reach[c] |= reach[comp[nxt]]
+                        key_then_exit[c] = key_then_exit[c] or key_then_exit[comp[nxt]]
+            has_key = any(masks[node] & self.key_bit for node in members[c])
+            if has_key and reach[c] & self.exit_bit:
+                key_then_exit[c] = True
+
+        def safe(node, left, key):
+            c = comp[node]
+            return reach[c] & left == left and (key_then_exit[c] if not key else reach[c] & self.exit_bit)
+
+        node = 0
+        left = coins & ~masks[0]
+        key = bool(masks[0] & self.key_bit)
+        ticks = 0
+        while True:
+            dist, parent = self.distances(node, edges)
+            if left:
+                want = left
+            elif not key:
+                want = self.key_bit
+            else:
+                want = self.exit_bit
+            target = None
+            for nxt in sorted((n for n in range(len(edges)) if dist[n] >= 0 and masks[n] & want), key=dist.__getitem__):
+                if want == self.exit_bit or safe(nxt, left & ~masks[nxt], key or bool(masks[nxt] & self.key_bit)):
+                    target = nxt
+                    break
+            if target is None:
+                return None, bin(left).count("1")
+            ticks += dist[target]
+            if want == self.exit_bit:
+                return ticks + 1, 0
+            step = target
+            while step != node:
+                left &= ~masks[step]
+                key = key or bool(masks[step] & self.key_bit)
+                step = parent[step]
+            node = target
+
+    def run(self):
+        start = time.perf_counter()
+        if self.spawn is None or not self.physics.valid(self.spawn):
+            return {"level": self.name, "error": "no valid spawn"}
+        states, edges = self.explore()
+        masks = [self.items(state) for state in states]
+        touched = 0
+        for mask in masks:
+            touched |= mask
+
+        tile = self.tilemap.tile_size
+        # недостижимые монеты уже в отчёте, маршрут строится по остальным
+        full_clear, coins_left = self.full_clear(edges, masks, touched & self.all_coins)
+        keys = [] if touched & self.key_bit else self.keys
+        return {"level": self.name, "states": len(states),
+                "unreachable_coins": [(x // tile, y // tile) for i, (x, y, w, h) in enumerate(self.coins)
+                                      if not touched & 1 << i],
+                "unreachable_keys": [(x // tile, y // tile) for x, y, w, h in keys],
+                "exit_reachable": bool(touched & self.exit_bit), "min_ticks": self.min_completion(edges, masks),
+                "full_clear_ticks": full_clear, "coins_left": coins_left, "elapsed": time.perf_counter() - start}
+
+
+def analyse(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return LevelAnalysis(name, load_level_data(path)).run()
+
+
+def report(result):
+    if "error" in result:
+        return f"{result['level']:8} {result['error']}"
+    lines = [f"{result['level']:8} {result['states']} states in {result['elapsed']:.1f} s"]
+    if result["min_ticks"] is None:
+        lines.append("  NOT COMPLETABLE: no path spawn -> key -> exit without fire")
+    else:
+        lines.append(f"  min completion: {result['min_ticks']} ticks ({result['min_ticks'] / FPS:.1f} s)")
+    if result["full_clear_ticks"] is None:
+        lines.append(f"  full clear: no single run found, {result['coins_left']} coins left")
+    else:
+        lines.append(f"  full clear (greedy): {result['full_clear_ticks']} ticks "
+                     f"({result['full_clear_ticks'] / FPS:.1f} s)")
+    if result["unreachable_coins"]:
+        lines.append("  unreachable coins: " + ", ".join(f"({x}, {y})" for x, y in result["unreachable_coins"]))
+    if result["unreachable_keys"]:
+        lines.append("  unreachable keys: " + ", ".join(f"({x}, {y})" for x, y in result["unreachable_keys"]))
+    if not result["exit_reachable"]:
+        lines.append("  exit unreachable")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enigma Exit level analyser")
+    parser.add_argument("levels", nargs="*", help="tmx files, data/levels/*.tmx by default")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    paths = args.levels or [os.path.join("data/levels", name) for name in sorted(os.listdir("data/levels"))
+                            if name.endswith(".tmx")]
+
+    start = time.perf_counter()
+    broken = 0
+    # уровни независимы, каждый ищется в своём процессе
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for result in pool.map(analyse, paths):
+            print(report(result))
+            if "error" in result or result["min_ticks"] is None or result["full_clear_ticks"] is None \
+                    or result["unreachable_coins"]:
+                broken += 1
+    print(f"{len(paths)} levels, {broken} with problems, {time.perf_counter() - start:.1f} s")
+    return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+from assets import assets
+
+
+class Clip:
+    def __init__(self, frames, flipped):
+        self.frames = frames
+        self.flipped = flipped  # отражённые по горизонтали, готовятся один раз
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, index, flip=False):
+        bank = self.flipped if flip else self.frames
+        return bank[index % len(bank)]
+
+
+class AnimationClock:
+    def __init__(self, frame_ticks):
+        self.frame_ticks = frame_ticks
+        self.ticks = 0
+        self.frame = 0
+
+    def reset(self):
+        self.ticks = 0
+        self.frame = 0
+
+    def tick(self):
+        # True, если на этом тике сменился кадр
+        self.ticks += 1
+        if self.ticks % self.frame_ticks:
+            return False
+        self.frame += 1
+        return True
+
+
+clips = {}
+anim_clock = AnimationClock(12)  # кадр анимации раз в 200 мс
+
+
+def load_clip(type, count, size):
+    key = (type, count, tuple(size))
+    if key not in clips:
+        paths = [f'data/sprites/{type}/{name}.png' for name in range(count)]
+        clips[key] = Clip([assets.get(path, size) for path in paths],
+                          [assets.get(path, size, flip=(True, False)) for path in paths])
+    return clips[key]
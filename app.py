@@ -1,5 +1,9 @@
-from main import Game
+import time
 
-app = Game((1260, 720))
+started = time.perf_counter()
 
-app.main_menu()
+from main import Game, RENDER_SIZE
+
+app = Game(RENDER_SIZE, fast_start=True, started=started)
+
+app.run()
@@ -0,0 +1,89 @@
+import pygame
+import weakref
+import threading
+from collections import OrderedDict
+
+
+class AssetManager:
+    def __init__(self, budget=64 * 1024 * 1024):
+        self.budget = budget  # байты
+        self.used = 0
+        self.cache = OrderedDict()
+        self.atlas = None
+        self.frames = {}  # (путь, размер, отражение) -> subsurface атласа
+        # кадр -> {масштаб: уменьшенная копия} для мира в низком разрешении; запись живёт, пока жив сам кадр,
+        # так что картинки уровня (ключ из TileMap.image) уходят вместе с уровнем
+        self.reduced = weakref.WeakKeyDictionary()
+        self.lock = threading.RLock()  # уровни подгружаются в фоновом потоке
+
+    def get(self, path, size=None, flip=(False, False), rotation=0):
+        with self.lock:
+            return self.load(path, size, flip, rotation)
+
+    def load(self, path, size, flip, rotation):
+        key = (path, size and tuple(size), tuple(flip), rotation)
+        surf = self.cache.get(key)
+        if surf is not None:
+            self.cache.move_to_end(key)
+            return surf
+        if not rotation and not flip[1]:
+            surf = self.frames.get((path, key[1], flip[0]))
+            if surf is not None:
+                return surf
+
+        # каждый шаг строится из предыдущего, поэтому повороты тоже берут кадр из атласа
+        if rotation:
+            surf = pygame.transform.rotate(self.get(path, size, flip), rotation)
+        elif any(flip):
+            surf = pygame.transform.flip(self.get(path, size), *flip)
+        elif size is not None:
+            surf = pygame.transform.scale(self.get(path), size)
+        else:
+            surf = pygame.image.load(path).convert_alpha()
+
+        self.cache[key] = surf
+        self.used += self.surface_bytes(surf)
+        self.evict(keep=key)
+        return surf
+
+    def scaled(self, surf, factor):
+        with self.lock:
+            copies = self.reduced.get(surf)
+            if copies is None:
+                copies = self.reduced[surf] = {}
+            reduced = copies.get(factor)
+            if reduced is None:
+                w, h = surf.get_size()
+                reduced = copies[factor] = pygame.transform.smoothscale(surf, (max(1, round(w * factor)),
+                                                                               max(1, round(h * factor))))
+            return reduced
+
+    def add_atlas(self, atlas, entries):
+        with self.lock:
+            self.atlas = atlas
+            self.frames = {(path, size, flip): atlas.subsurface(pos, size) for path, size, flip, pos in entries}
+
+    def set_budget(self, budget):
+        with self.lock:
+            self.budget = budget
+            self.evict()
+
+    def evict(self, keep=None):
+        for key in list(self.cache):
+            if self.used <= self.budget:
+                break
+            if key != keep:
+                self.used -= self.surface_bytes(self.cache.pop(key))
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.reduced.clear()
+            self.used = 0
+
+    @staticmethod
+    def surface_bytes(surf):
+        return surf.get_pitch() * surf.get_height()
+
+
+assets = AssetManager()
@@ -0,0 +1,117 @@
+import os
+import hashlib
+import pygame
+from assets import assets
+
+VERSION = 1
+COMPILED_DIR = "data/sprites/compiled"
+ATLAS_PATH = os.path.join(COMPILED_DIR, "atlas.png")
+INDEX_PATH = os.path.join(COMPILED_DIR, "atlas.idx")
+ATLAS_WIDTH = 1024
+
+# картинки интерфейса в тех размерах, в которых их просят сцены
+UI_SPRITES = [("data/sprites/ui/0.png", (10, 9)), ("data/sprites/ui/1.png", (10, 9)),
+              ("data/sprites/ui/0.png", (64, 56)), ("data/sprites/ui/1.png", (64, 56)),
+              ("data/sprites/ui/button.png", (184, 56)), ("data/sprites/ui/button.png", (200, 56)),
+              ("data/sprites/ui/button.png", (220, 56)), ("data/sprites/ui/button_small.png", (56, 56)),
+              ("data/sprites/ui/ARROWLEFT.png", (64, 64)), ("data/sprites/ui/ARROWRIGHT.png", (64, 64)),
+              ("data/sprites/ui/ARROWUP.png", (64, 64)), ("data/sprites/ui/key.png", (64, 64)),
+              ("data/sprites/ui/exit.png", (64, 64)), ("data/sprites/coin/5.png", (64, 64))]
+
+
+def sprite_list():
+    from player import CLIPS
+    from tiles import COIN_CLIP
+    sprites = []
+    for type, count, size in list(CLIPS.values()) + [COIN_CLIP]:
+        for name in range(count):
+            path = f"data/sprites/{type}/{name}.png"
+            sprites.append((path, size, False))
+            sprites.append((path, size, True))
+    sprites += [(path, size, False) for path, size in UI_SPRITES]
+    return sprites
+
+
+def sources_digest(sprites):
+    # только stat, без чтения файлов: проверка свежести не должна открывать десятки png
+    digest = hashlib.sha256(repr(sprites).encode())
+    for path in sorted({path for path, size, flip in sprites}):
+        stat = os.stat(path)
+        digest.update(f"{path} {stat.st_size} {stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def pack(sizes, width):
+    # полки: кадры по убыванию высоты, новая полка, когда строка кончилась
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf = 0
+    for i in order:
+        w, h = sizes[i]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        positions[i] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return positions, y + shelf
+
+
+def build_atlas(sprites=None):
+    sprites = sprites or sprite_list()
+    images = {}
+    frames = []
+    for path, size, flip in sprites:
+        if path not in images:
+            images[path] = pygame.image.load(path)
+        frame = pygame.transform.scale(images[path], size)
+        frames.append(pygame.transform.flip(frame, True, False) if flip else frame)
+
+    positions, height = pack([frame.get_size() for frame in frames], ATLAS_WIDTH)
+    atlas = pygame.Surface((ATLAS_WIDTH, height), pygame.SRCALPHA, 32)
+    for frame, pos in zip(frames, positions):
+        # MAX по пустому фону копирует пиксели как есть, обычный blit смешал бы полупрозрачные
+        atlas.blit(frame, pos, special_flags=pygame.BLEND_RGBA_MAX)
+
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    tmp_path = ATLAS_PATH + ".tmp.png"
+    pygame.image.save(atlas, tmp_path)
+    os.replace(tmp_path, ATLAS_PATH)
+    lines = [f"version {VERSION} {sources_digest(sprites)}"]
+    for (path, size, flip), (x, y) in zip(sprites, positions):
+        lines.append(f"{path} {size[0]} {size[1]} {int(flip)} {x} {y}")
+    with open(INDEX_PATH + ".tmp", "w") as out:
+        out.write("\n".join(lines) + "\n")
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    return ATLAS_PATH
+
+
+def read_index(sprites):
+    try:
+        with open(INDEX_PATH) as index:
+            lines = index.read().splitlines()
+    except OSError:
+        return None
+    header = lines[0].split() if lines else []
+    if header != ["version", str(VERSION), sources_digest(sprites)] or not os.path.exists(ATLAS_PATH):
+        return None
+    entries = []
+    for line in lines[1:]:
+        path, w, h, flip, x, y = line.split()
+        entries.append((path, (int(w), int(h)), bool(int(flip)), (int(x), int(y))))
+    return entries
+
+
+def load_atlas():
+    # один файл и одно декодирование вместо полусотни png; кадры - subsurface общей поверхности
+    sprites = sprite_list()
+    entries = read_index(sprites)
+    if entries is None:
+        build_atlas(sprites)
+        entries = read_index(sprites)
+    atlas = pygame.image.load(ATLAS_PATH).convert_alpha()
+    assets.add_atlas(atlas, entries)
+    return atlas
+
+
+if __name__ == "__main__":
+    print(build_atlas())
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import tracemalloc
+import pygame
+from main import Game, RENDER_SIZE
+from controls import RandomInput
+from levels import compile_level, compiled_path, LevelData
+from profiler import Profiler, PHASES
+
+
+class BenchGame(Game):
+    # вместо экранов победы и проигрыша просто начинаем уровень заново
+    def finish(self, outcome):
+        self.finished += 1
+        self.del_level()
+        self.load_level(self.preloader.get(self.cur_level), self.bench_controls)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summary(values):
+    return {"mean": sum(values) / len(values) * 1000 if values else 0,
+            "p50": percentile(values, 50) * 1000, "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000, "max": max(values, default=0) * 1000}
+
+
+def bench_load(game, level, repeat):
+    path = game.levels[level]
+    start = time.perf_counter()
+    compile_level(path)
+    compile_time = time.perf_counter() - start
+
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        game.load_level(LevelData(compiled_path(path)))
+        load_times.append(time.perf_counter() - start)
+        game.del_level()
+
+    # память меряем отдельным проходом, tracemalloc сильно замедляет загрузку
+    tracemalloc.start()
+    game.load_level(LevelData(compiled_path(path)))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    game.del_level()
+    return {"compile_ms": compile_time * 1000, "load_ms": summary(load_times), "load_peak_kb": peak / 1024}
+
+
+def bench_frames(game, level, frames, seed):
+    game.cur_level = level
+    game.finished = 0
+    game.bench_controls = RandomInput(seed)
+    game.seed(seed)
+    game.load_level(game.preloader.get(level), game.bench_controls)
+    game.profiler = Profiler(enabled=True, history=None)
+    weather_on = level == "rain"
+    for _ in range(frames):
+        game.update(weather_on)
+    game.profiler.enabled = False
+    game.del_level()
+
+    samples = game.profiler.history
+    result = {"frames": len(samples), "restarts": game.finished,
+              "frame_ms": summary([sample["frame"] for sample in samples]), "phases_ms": {}}
+    for phase in PHASES:
+        result["phases_ms"][phase] = summary([sample.get(phase, 0) for sample in samples])
+    return result
+
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+import json
+import pygame
+from main import Game, RENDER_SIZE
+from scenes import SplashScene, MainMenuScene
+game = Game(RENDER_SIZE, headless=True, fast_start=True, started=started)
+game.push(SplashScene(game))
+while not isinstance(game.scenes[-1], MainMenuScene):
+    pygame.event.pump()
+    game.scenes[-1].update(0)
+    game.scenes[-1].draw()
+    game.startup.mark("first frame")
+print(json.dumps(game.startup.marks))
+"""
+
+
+def bench_startup(repeat):
+    # каждый запуск в новом процессе, иначе импорты уже закешированы
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT],
+                                         env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"))
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return {name: percentile([run[name] for run in runs], 50) for name in runs[0]}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    if "first frame" in old.get("startup_ms", {}) and "first frame" in new.get("startup_ms", {}):
+        value, old_value = new["startup_ms"]["first frame"], old["startup_ms"]["first frame"]
+        print(f"startup  first frame {old_value:8.1f} -> {value:8.1f} ms ({(value - old_value) / old_value * 100:+.1f}%)")
+    for level, result in new["levels"].items():
+        if level not in old["levels"]:
+            continue
+        before = old["levels"][level]
+        for name, value, old_value in (("load p50", result["load"]["load_ms"]["p50"], before["load"]["load_ms"]["p50"]),
+                                       ("frame p50", result["frame_ms"]["p50"], before["frame_ms"]["p50"]),
+                                       ("frame p99", result["frame_ms"]["p99"], before["frame_ms"]["p99"])):
+            change = (value - old_value) / old_value * 100 if old_value else 0
+            print(f"{level:8} {name:10} {old_value:8.3f} -> {value:8.3f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enigma Exit benchmarks")
+    parser.add_argument("levels", nargs="*")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--load-repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--startup-repeat", type=int, default=5)
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    game = BenchGame(RENDER_SIZE, headless=True)
+    game.record_replays = False
+    report = {"commit": git_commit(), "python": platform.python_version(), "pygame": pygame.version.ver,
+              "platform": platform.platform(), "frames": args.frames, "seed": args.seed, "levels": {}}
+    if args.startup_repeat:
+        report["startup_ms"] = bench_startup(args.startup_repeat)
+        print("startup p50 " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in report["startup_ms"].items()))
+    for level in args.levels or game.levels:
+        result = bench_frames(game, level, args.frames, args.seed)
+        result["load"] = bench_load(game, level, args.load_repeat)
+        result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["levels"][level] = result
+        print(f"{level:8} load {result['load']['load_ms']['p50']:.2f} ms, frame p50/p95/p99 "
+              f"{result['frame_ms']['p50']:.3f}/{result['frame_ms']['p95']:.3f}/{result['frame_ms']['p99']:.3f} ms")
+
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=2)
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as old:
+            compare(json.load(old), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
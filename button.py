@@ -1,31 +1,39 @@
+from fonts import render_text
+
+
 class Button:
-    def __init__(self, image, pos, text_input, font, base_color, hovering_color, shiftx=0, shifty=-10):
+    def __init__(self, image, pos, text_input, font_size, base_color, hovering_color, shiftx=0, shifty=-10):
         self.image = image
         self.x_pos = pos[0]
         self.y_pos = pos[1]
-        self.font = font
-        self.base_color, self.hovering_color = base_color, hovering_color
         self.text_input = text_input
-        self.text = self.font.render(self.text_input, True, self.base_color)
+        # оба состояния текста готовятся один раз
+        self.base_text = render_text(self.text_input, font_size, base_color)
+        self.hovering_text = render_text(self.text_input, font_size, hovering_color)
+        self.text = self.base_text
         if self.image is None:
             self.image = self.text
         self.rect = self.image.get_rect(center=(self.x_pos, self.y_pos))
         self.text_rect = self.text.get_rect(center=(self.x_pos + shiftx, self.y_pos + shifty))
+        self.area = self.rect.union(self.text_rect)
+        self.hovered = False
+        self.focused = False
+        self.dirty = True
 
     def update(self, screen):
-        if self.image is not None:
-            screen.blit(self.image, self.rect)
+        screen.blit(self.image, self.rect)
         screen.blit(self.text, self.text_rect)
 
     def checkForInput(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top,
-                                                                                          self.rect.bottom):
-            return True
-        return False
+        return self.rect.collidepoint(position)
 
     def changeColor(self, position):
-        if position[0] in range(self.rect.left, self.rect.right) and position[1] in range(self.rect.top,
-                                                                                          self.rect.bottom):
-            self.text = self.font.render(self.text_input, True, self.hovering_color)
-        else:
-            self.text = self.font.render(self.text_input, True, self.base_color)
+        return self.set_state(self.checkForInput(position), self.focused)
+
+    def set_state(self, hovered, focused):
+        highlighted = hovered or focused
+        changed = highlighted != (self.hovered or self.focused)
+        self.hovered, self.focused = hovered, focused
+        self.text = self.hovering_text if highlighted else self.base_text
+        self.dirty = self.dirty or changed
+        return changed
@@ -0,0 +1,34 @@
+import pygame
+
+
+class Camera:
+    def __init__(self, view_size, world_size=(0, 0)):
+        self.width, self.height = view_size
+        self.world_width, self.world_height = world_size
+        self.x = 0
+        self.y = 0
+
+    def set_world(self, world_size):
+        self.world_width, self.world_height = world_size
+        self.x = self.y = 0
+
+    def follow(self, rect):
+        # True, если камера сдвинулась и кадр нужно перерисовать целиком
+        x = rect.centerx - self.width // 2
+        y = rect.centery - self.height // 2
+        # карта меньше окна прижимается к левому верхнему углу
+        x = max(0, min(x, self.world_width - self.width))
+        y = max(0, min(y, self.world_height - self.height))
+        moved = (x, y) != (self.x, self.y)
+        self.x, self.y = x, y
+        return moved
+
+    @property
+    def offset(self):
+        return self.x, self.y
+
+    def view(self):
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
+    def apply(self, rect):
+        return rect.move(-self.x, -self.y)
@@ -0,0 +1,41 @@
+import random
+import pygame
+
+
+class Controls:
+    def __init__(self, left=False, right=False, jump=False):
+        self.left = left
+        self.right = right
+        self.jump = jump
+
+
+IDLE = Controls()
+
+
+class KeyboardInput:
+    def read(self):
+        key = pygame.key.get_pressed()
+        return Controls(key[pygame.K_LEFT], key[pygame.K_RIGHT], key[pygame.K_UP])
+
+
+class ScriptedInput:
+    def __init__(self, actions):
+        self.actions = iter(actions)
+
+    def read(self):
+        return next(self.actions, IDLE)
+
+
+class RandomInput:
+    def __init__(self, seed=None, hold=20):
+        self.rng = random.Random(seed)
+        self.hold = hold  # сколько шагов держим одно и то же действие
+        self.timer = 0
+        self.current = IDLE
+
+    def read(self):
+        if self.timer <= 0:
+            self.current = Controls(*(self.rng.random() < 0.5 for _ in range(3)))
+            self.timer = self.rng.randint(1, self.hold)
+        self.timer -= 1
+        return self.current
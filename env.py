@@ -0,0 +1,267 @@
+import sys
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from main import Game, RENDER_SIZE
+from animation import anim_clock
+from replay import unpack_controls
+from controls import IDLE
+
+# клетка сетки наблюдения: флаги тайлов из tilemap плюс предметы
+COIN = 8
+KEY = 16
+STATE_FIELDS = ("x", "y", "vel_y", "in_air", "jumped", "life", "hit", "key", "coins", "coins_left",
+                "view_x", "view_y")
+ACTION_COUNT = 8  # биты как в повторах: 1 - влево, 2 - вправо, 4 - прыжок
+MAX_TICKS = 60 * 60 * 5
+COIN_REWARD = 1
+WIN_REWARD = 10
+HIT_PENALTY = 1
+
+
+class ActionInput:
+    def __init__(self):
+        self.controls = IDLE
+
+    def read(self):
+        return self.controls
+
+
+class GameEnv:
+    # один игрок в безоконной игре; шаг среды - один шаг симуляции, без отрисовки
+    def __init__(self, level="level_0", seed=0, max_ticks=MAX_TICKS, size=RENDER_SIZE):
+        self.game = Game(size, headless=True)
+        self.game.record_replays = False
+        self.level = level
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.input = ActionInput()
+        self.grid_shape = (size[1] // 36, size[0] // 36)  # то, что влезает в окно
+        self.clock = (0, 0)
+        self.flags = None
+        self.ticks = 0
+
+    def reset(self, level=None, seed=None, grid=None, state=None):
+        game = self.game
+        if game.tilemap is not None:
+            game.del_level()
+        self.level = level or self.level
+        if seed is not None:
+            self.seed = seed
+        game.cur_level = self.level
+        game.seed(self.seed)
+        self.seed += 1
+        self.input.controls = IDLE
+        game.load_level(game.preloader.get(self.level), self.input)
+        self.clock = (anim_clock.ticks, anim_clock.frame)
+        tilemap = game.tilemap
+        self.flags = np.frombuffer(tilemap.flags, np.uint8).reshape(tilemap.height, tilemap.width)
+        self.ticks = 0
+        return self.observe(grid, state)
+
+    def step(self, action, grid=None, state=None):
+        game = self.game
+        player = game.player
+        coins, life = game.coin, player.life
+        self.input.controls = unpack_controls(action)
+        # часы анимации общие на процесс, а от них зависит, когда кончится смерть
+        anim_clock.ticks, anim_clock.frame = self.clock
+        # погода на игру не влияет, её не считаем
+        outcome = game.step(False)
+        self.clock = (anim_clock.ticks, anim_clock.frame)
+        self.ticks += 1
+
+        reward = (game.coin - coins) * COIN_REWARD - (life - player.life) * HIT_PENALTY
+        if outcome == "win":
+            reward += WIN_REWARD
+        done = outcome is not None or self.ticks >= self.max_ticks
+        info = {"level": self.level, "ticks": self.ticks, "coins": game.coin, "life": player.life,
+                "outcome": outcome or ("timeout" if done else None)}
+        return self.observe(grid, state), reward, done, info
+
+    def observe(self, grid=None, state=None):
+        # в переданные массивы пишем на месте: так наблюдения сразу попадают в общую память
+        game = self.game
+        player = game.player
+        if grid is None:
+            grid = np.zeros(self.grid_shape, np.uint8)
+        if state is None:
+            state = np.zeros(len(STATE_FIELDS), np.float32)
+
+        game.camera.follow(player.rect)
+        size = game.tilemap.tile_size
+        tx, ty = game.camera.x // size, game.camera.y // size
+        rows, cols = grid.shape
+        window = self.flags[ty:ty + rows, tx:tx + cols]
+        grid.fill(0)
+        grid[:window.shape[0], :window.shape[1]] = window
+        for group, bit in ((game.coin_group, COIN), (game.key_group, KEY)):
+            for sprite in group:
+                x, y = sprite.rect.x // size - tx, sprite.rect.y // size - ty
+                if 0 <= x < cols and 0 <= y < rows:
+                    grid[y, x] |= bit
+
+        state[:] = (player.rect.x, player.rect.y, player.vel_y, player.in_air, player.jumped, player.life,
+                    player.hit, game.key, game.coin, len(game.coin_group), game.camera.x, game.camera.y)
+        return grid, state
+
+    def close(self):
+        if self.game.tilemap is not None:
+            self.game.del_level()
+
+
+def attach(names, count, grid_shape):
+    memory = [shared_memory.SharedMemory(name=name) for name in names]
+    arrays = buffers(memory, count, grid_shape)
+    return memory, arrays
+
+
+def buffers(memory, count, grid_shape):
+    grid, state, actions, rewards, dones = memory
+    return (np.ndarray((count, *grid_shape), np.uint8, grid.buf),
+            np.ndarray((count, len(STATE_FIELDS)), np.float32, state.buf),
+            np.ndarray(count, np.uint8, actions.buf),
+            np.ndarray(count, np.float32, rewards.buf),
+            np.ndarray(count, np.uint8, dones.buf))
+
+
+def worker(pipe, names, count, grid_shape, indices, levels, seed, max_ticks):
+    memory, (grid, state, actions, rewards, dones) = attach(names, count, grid_shape)
+    envs = {i: GameEnv(levels[i % len(levels)], seed + i, max_ticks) for i in indices}
+    try:
+        while True:
+            command = pipe.recv()
+            if command == "close":
+                break
+            infos = {}
+            for i, env in envs.items():
+                if command == "reset":
+                    env.reset(grid=grid[i], state=state[i])
+                    rewards[i] = dones[i] = 0
+                    continue
+                _, rewards[i], done, info = env.step(int(actions[i]), grid[i], state[i])
+                dones[i] = done
+                if done:
+                    # как в gym.vector: закончившаяся среда сразу начинает новый эпизод
+                    infos[i] = info
+                    env.reset(grid=grid[i], state=state[i])
+            pipe.send(infos)
+    finally:
+        for env in envs.values():
+            env.close()
+        for block in memory:
+            block.close()
+
+
+class VectorEnv:
+    # N независимых игр в процессах-воркерах; наблюдения, действия и награды лежат в общей памяти
+    def __init__(self, count, levels=("level_0",), workers=None, seed=0, max_ticks=MAX_TICKS, size=RENDER_SIZE):
+        self.count = count
+        self.grid_shape = (size[1] // 36, size[0] // 36)
+        workers = min(count, workers or multiprocessing.cpu_count())
+        sizes = (count * self.grid_shape[0] * self.grid_shape[1], count * len(STATE_FIELDS) * 4, count, count * 4,
+                 count)
+        self.memory = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        self.grid, self.state, self.actions, self.rewards, self.dones = buffers(self.memory, count, self.grid_shape)
+
+        context = multiprocessing.get_context("spawn")
+        self.pipes = []
+        self.processes = []
+        names = [block.name for block in self.memory]
+        for w in range(workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=worker, daemon=True,
+                                      args=(child, names, count, self.grid_shape, list(range(w, count, workers)),
+                                            list(levels), seed, max_ticks))
+            process.start()
+            child.close()  # конец трубы остаётся только у воркера, иначе его смерть не заметить
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def reset(self):
+        for pipe in self.pipes:
+            pipe.send("reset")
+        for pipe in self.pipes:
+            pipe.recv()
+        return self.grid, self.state
+
+    def step(self, actions):
+        # возвращаются сами общие массивы: следующий step их перезапишет, нужное копируйте
+        self.actions[:] = actions
+        for pipe in self.pipes:
+            pipe.send("step")
+        infos = {}
+        for pipe in self.pipes:
+            infos.update(pipe.recv())
+        return self.grid, self.state, self.rewards, self.dones.astype(bool), infos
+
+    def close(self, timeout=5):
+        # упавший воркер не должен оставить за собой блоки общей памяти
+        try:
+            for pipe in self.pipes:
+                try:
+                    pipe.send("close")
+                except (BrokenPipeError, EOFError):
+                    pass
+            for process in self.processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        finally:
+            for pipe in self.pipes:
+                pipe.close()
+            for block in self.memory:
+                block.close()
+                block.unlink()
+            self.pipes = []
+            self.processes = []
+            self.memory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enigma Exit environment throughput")
+    parser.add_argument("levels", nargs="*", default=["level_0"])
+    parser.add_argument("--envs", type=int, default=8)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    env = GameEnv(args.levels[0], args.seed)
+    env.reset()
+    episodes = 0
+    start = time.perf_counter()
+    for action in rng.integers(0, ACTION_COUNT, args.steps):
+        _, _, done, _ = env.step(int(action))
+        if done:
+            episodes += 1
+            env.reset()
+    elapsed = time.perf_counter() - start
+    env.close()
+    print(f"1 env: {args.steps} steps in {elapsed:.2f} s ({args.steps / elapsed:.0f} steps/s), {episodes} episodes")
+
+    with VectorEnv(args.envs, args.levels, args.workers, args.seed) as vector:
+        vector.reset()
+        episodes = 0
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            _, _, _, dones, _ = vector.step(rng.integers(0, ACTION_COUNT, args.envs))
+            episodes += int(dones.sum())
+        elapsed = time.perf_counter() - start
+        steps = args.steps * args.envs
+        print(f"{args.envs} envs / {len(vector.processes)} workers: {steps} steps in {elapsed:.2f} s "
+              f"({steps / elapsed:.0f} steps/s), {episodes} episodes")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
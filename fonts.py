@@ -0,0 +1,42 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, path, max_items=256):
+        self.path = path
+        self.max_items = max_items
+        self.fonts = {}
+        self.rendered = OrderedDict()
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(self.path, size)
+        return font
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, color, antialias)
+        surf = self.rendered.get(key)
+        if surf is not None:
+            self.rendered.move_to_end(key)
+            return surf
+
+        surf = self.rendered[key] = self.font(size).render(text, antialias, color)
+        if len(self.rendered) > self.max_items:
+            self.rendered.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.rendered.clear()
+
+
+text_cache = TextCache("data/font.ttf")
+
+
+def get_font(size):
+    return text_cache.font(size)
+
+
+def render_text(text, size, color, antialias=True):
+    return text_cache.render(text, size, color, antialias)
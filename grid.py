@@ -0,0 +1,30 @@
+class SpatialGrid:
+    def __init__(self, cell_size=36):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def cells_for(self, rect):
+        size = self.cell_size
+        for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                yield cx, cy
+
+    def insert(self, sprite):
+        for cell in self.cells_for(sprite.rect):
+            self.cells.setdefault(cell, []).append(sprite)
+        return sprite
+
+    def query(self, rect, group=None):
+        # dict вместо set, чтобы сохранить порядок обхода тайлов
+        found = {}
+        for cell in self.cells_for(rect):
+            for sprite in self.cells.get(cell, ()):
+                if group is None or group.has(sprite):
+                    found[sprite] = None
+        return list(found)
+
+    def collide(self, rect, group):
+        return [sprite for sprite in self.query(rect, group) if rect.colliderect(sprite.rect)]
+
+    def clear(self):
+        self.cells.clear()
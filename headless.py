@@ -0,0 +1,28 @@
+import sys
+import time
+from main import Game, RENDER_SIZE
+from controls import RandomInput
+
+
+def run(levels=None, runs=100, seed=0):
+    game = Game(RENDER_SIZE, headless=True)
+    results = []
+    start = time.perf_counter()
+    for level in levels or game.levels:
+        for i in range(runs):
+            results.append(game.simulate(level, RandomInput(seed + i)))
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    results, elapsed = run(sys.argv[2:], runs)
+    for level in dict.fromkeys(result["level"] for result in results):
+        level_results = [result for result in results if result["level"] == level]
+        outcomes = {}
+        for result in level_results:
+            outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+        print(level, outcomes, "max coins:", max(result["coins"] for result in level_results))
+    ticks = sum(result["ticks"] for result in results)
+    print(f"{len(results)} runs, {ticks} ticks in {elapsed:.1f} s ({ticks / elapsed:.0f} ticks/s)")
@@ -0,0 +1,313 @@
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import threading
+from array import array
+import pygame
+import numpy as np
+from assets import assets
+
+MAGIC = b"EELV"
+VERSION = 1
+COMPILED_DIR = "data/levels/compiled"
+ENTITY_LAYERS = ("coins", "key", "spawn")
+
+FLIP_H = 0x80000000
+FLIP_V = 0x40000000
+FLIP_D = 0x20000000
+GID_MASK = 0x1FFFFFFF
+
+HEADER = struct.Struct("<4sH32sHHHHHHHH")
+SOURCE = struct.Struct("<H")
+TILESET = struct.Struct("<IHHHHHHH")
+LAYER = struct.Struct("<HB")
+ENTITY = struct.Struct("<HHHI")
+
+
+def compiled_path(tmx_path):
+    name = os.path.splitext(os.path.basename(tmx_path))[0]
+    return os.path.join(COMPILED_DIR, name + ".lvl")
+
+
+def source_hash(sources):
+    digest = hashlib.sha256()
+    for path in sources:
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    return digest.digest()
+
+
+def read_layer_data(node, width, height, tmx_path):
+    # разбор tmx нужен только при пересборке, на обычном запуске эти модули не грузятся.
+    # Поддерживаются только конечные карты с тайловыми слоями верхнего уровня: csv, base64 (без сжатия,
+    # zlib, gzip) и устаревший xml из <tile>. Не поддерживаются бесконечные карты (<chunk>), сжатие zstd,
+    # группы слоёв, слои объектов и картинок, свойства и анимации тайлов
+    import zlib
+    import gzip
+    import base64
+    name = node.get("name")
+    data = node.find("data")
+    encoding = data.get("encoding")
+    compression = data.get("compression")
+    if data.find("chunk") is not None:
+        raise ValueError(f"{tmx_path}: layer {name!r} is stored in chunks (infinite map), not supported")
+    if encoding == "csv":
+        gids = [int(gid) for gid in data.text.replace("\n", "").split(",") if gid.strip()]
+    elif encoding == "base64":
+        raw = base64.b64decode(data.text.strip())
+        if compression == "zlib":
+            raw = zlib.decompress(raw)
+        elif compression == "gzip":
+            raw = gzip.decompress(raw)
+        elif compression:
+            raise ValueError(f"{tmx_path}: layer {name!r} uses unsupported compression {compression!r}")
+        if len(raw) % 4:
+            raise ValueError(f"{tmx_path}: layer {name!r} has truncated base64 data")
+        gids = list(struct.unpack(f"<{len(raw) // 4}I", raw))
+    elif encoding is None:
+        gids = [int(tile.get("gid", 0)) for tile in data.findall("tile")]
+    else:
+        raise ValueError(f"{tmx_path}: layer {name!r} uses unsupported encoding {encoding!r}")
+    if len(gids) != width * height:
+        raise ValueError(f"{tmx_path}: layer {name!r} has {len(gids)} tiles, expected {width}x{height}")
+    return gids
+
+
+def compile_level(tmx_path, out_path=None):
+    import xml.etree.ElementTree as ET
+    out_path = out_path or compiled_path(tmx_path)
+    base = os.path.dirname(tmx_path)
+    root = ET.parse(tmx_path).getroot()
+    if root.get("infinite") == "1":
+        raise ValueError(f"{tmx_path}: infinite maps are not supported")
+    width, height = int(root.get("width")), int(root.get("height"))
+
+    sources = [tmx_path]
+    tilesets = []
+    for node in root.findall("tileset"):
+        firstgid = int(node.get("firstgid"))
+        if node.get("source"):
+            tsx_path = os.path.join(base, node.get("source"))
+            sources.append(tsx_path)
+            node = ET.parse(tsx_path).getroot()
+            image_base = os.path.dirname(tsx_path)
+        else:
+            image_base = base
+        image = node.find("image")
+        tilesets.append((firstgid, int(node.get("columns")), int(node.get("tilecount")),
+                         int(node.get("tilewidth")), int(node.get("tileheight")),
+                         int(node.get("margin", 0)), int(node.get("spacing", 0)),
+                         os.path.normpath(os.path.join(image_base, image.get("source"))).replace(os.sep, "/")))
+
+    layers = []
+    entities = []
+    spawn = (0xFFFF, 0xFFFF)
+    for node in root.findall("layer"):
+        if node.get("visible") == "0":
+            continue
+        name = node.get("name")
+        gids = read_layer_data(node, width, height, tmx_path)
+        if name in ENTITY_LAYERS:
+            for i, gid in enumerate(gids):
+                if gid:
+                    x, y = i % width, i // width
+                    if name == "spawn":
+                        spawn = (x, y)
+                    else:
+                        entities.append((name, x, y, gid))
+        else:
+            layers.append((name, gids))
+
+    out = bytearray()
+    out += HEADER.pack(MAGIC, VERSION, source_hash(sources), width, height,
+                       int(root.get("tilewidth")), int(root.get("tileheight")),
+                       len(sources), len(tilesets), len(layers), len(entities))
+    out += struct.pack("<HH", *spawn)
+    for path in sources:
+        path = path.replace(os.sep, "/").encode()
+        out += SOURCE.pack(len(path)) + path
+    for *info, image in tilesets:
+        image = image.encode()
+        out += TILESET.pack(*info, len(image)) + image
+    for name, gids in layers:
+        name = name.encode()
+        out += LAYER.pack(len(name), 1) + name
+        data = array("I", gids)
+        if sys.byteorder != "little":
+            data.byteswap()
+        out += data.tobytes()
+    for kind, x, y, gid in entities:
+        kind = kind.encode()
+        out += ENTITY.pack(len(kind), x, y, gid) + kind
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as compiled:
+        compiled.write(out)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class LevelLayer:
+    def __init__(self, level, name, data):
+        self.level = level
+        self.name = name
+        self.data = data
+
+    def tiles(self):
+        width = self.level.width
+        for i, gid in enumerate(self.data):
+            if gid:
+                yield i % width, i // width, self.level.tile_image(gid)
+
+
+class LevelData:
+    def __init__(self, path):
+        with open(path, "rb") as compiled:
+            self.buffer = mmap.mmap(compiled.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.buffer)
+
+        (magic, version, self.digest, self.width, self.height, self.tilewidth, self.tileheight,
+         n_sources, n_tilesets, n_layers, n_entities) = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: unsupported level format")
+        offset = HEADER.size
+        spawn = struct.unpack_from("<HH", view, offset)
+        offset += 4
+        self.spawn = None if spawn[0] == 0xFFFF else spawn
+
+        self.sources = []
+        for _ in range(n_sources):
+            (size,) = SOURCE.unpack_from(view, offset)
+            offset += SOURCE.size
+            self.sources.append(bytes(view[offset:offset + size]).decode())
+            offset += size
+
+        self.tilesets = []
+        for _ in range(n_tilesets):
+            *info, size = TILESET.unpack_from(view, offset)
+            offset += TILESET.size
+            self.tilesets.append((*info, bytes(view[offset:offset + size]).decode()))
+            offset += size
+
+        self.visible_layers = []
+        count = self.width * self.height
+        for _ in range(n_layers):
+            size, visible = LAYER.unpack_from(view, offset)
+            offset += LAYER.size
+            name = bytes(view[offset:offset + size]).decode()
+            offset += size
+            data = view[offset:offset + count * 4].cast("I")
+            if sys.byteorder != "little":
+                data = array("I", data)
+                data.byteswap()
+            offset += count * 4
+            self.visible_layers.append(LevelLayer(self, name, data))
+
+        self.entities = []
+        for _ in range(n_entities):
+            size, x, y, gid = ENTITY.unpack_from(view, offset)
+            offset += ENTITY.size
+            self.entities.append((bytes(view[offset:offset + size]).decode(), x, y, gid))
+            offset += size
+
+        self.images = {}
+
+    def used_gids(self):
+        gids = set()
+        for layer in self.visible_layers:
+            gids.update(np.unique(np.frombuffer(layer.data, np.uint32)).tolist())
+        gids.discard(0)
+        return gids
+
+    def tile_image(self, gid):
+        image = self.images.get(gid)
+        if image is not None:
+            return image
+
+        tile = gid & GID_MASK
+        for firstgid, columns, count, tw, th, margin, spacing, path in reversed(self.tilesets):
+            if tile >= firstgid:
+                break
+        index = tile - firstgid
+        x = margin + (index % columns) * (tw + spacing)
+        y = margin + (index // columns) * (th + spacing)
+        image = assets.get(path).subsurface((x, y, tw, th))
+        if gid & FLIP_D:
+            image = pygame.transform.flip(pygame.transform.rotate(image, 270), True, False)
+        if gid & (FLIP_H | FLIP_V):
+            image = pygame.transform.flip(image, bool(gid & FLIP_H), bool(gid & FLIP_V))
+        self.images[gid] = image
+        return image
+
+
+def is_fresh(path):
+    try:
+        with open(path, "rb") as compiled:
+            magic, version, digest, *counts = HEADER.unpack(compiled.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return False
+            compiled.read(4)
+            sources = []
+            for _ in range(counts[4]):
+                (size,) = SOURCE.unpack(compiled.read(SOURCE.size))
+                sources.append(compiled.read(size).decode())
+        return source_hash(sources) == digest
+    except (OSError, struct.error, UnicodeDecodeError):
+        return False
+
+
+def load_level_data(tmx_path):
+    path = compiled_path(tmx_path)
+    if not is_fresh(path):
+        compile_level(tmx_path, path)
+    return LevelData(path)
+
+
+class LevelPreloader:
+    def __init__(self, levels):
+        self.levels = levels
+        self.ready = {}
+        self.failed = set()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        for name, path in self.levels.items():
+            try:
+                level = load_level_data(path)
+                # заранее режем тайлсет, чтобы play() не делал этого в кадре
+                for gid in level.used_gids():
+                    level.tile_image(gid)
+                for kind, x, y, gid in level.entities:
+                    level.tile_image(gid)
+            except Exception:
+                self.failed.add(name)
+                continue
+            self.ready[name] = level
+
+    def is_ready(self, name):
+        return name in self.ready or name in self.failed
+
+    def progress(self):
+        return (len(self.ready) + len(self.failed)) / len(self.levels)
+
+    def get(self, name):
+        level = self.ready.get(name)
+        if level is None:
+            # не успели или упали в фоне: грузим синхронно, чтобы ошибка была видна
+            level = self.ready[name] = load_level_data(self.levels[name])
+            self.failed.discard(name)
+        return level
+
+
+if __name__ == "__main__":
+    for name in sorted(os.listdir("data/levels")):
+        if name.endswith(".tmx"):
+            print(compile_level(os.path.join("data/levels", name)))
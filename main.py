@@ -1,645 +1,423 @@
+import os
 import sys
+import random
+import pygame
 from sound import SoundModule
-from player import Player
-from pytmx.util_pygame import load_pygame
-from button import Button
-from random import randint
 from weather import Weather
-from tiles import *
-import webbrowser
+from levels import LevelPreloader
+from grid import SpatialGrid
+from camera import Camera
+from tilemap import TileMap, FIRE, EXIT
+from render import DirtyRenderer
+from profiler import Profiler, StartupTimer
+from overlay import DebugOverlay
+from scenes import MainMenuScene, SplashScene, WinScene, RestartScene
+from controls import KeyboardInput
+from animation import anim_clock, load_clip
+from atlas import load_atlas
+from assets import assets
+from replay import Recording, RecordingInput, ReplayInput, REPLAYS_DIR, prune_replays
+from storage import Settings, SaveData
+from datetime import datetime
 
-ANIM = pygame.USEREVENT + 1
 SONG_ENDED = pygame.USEREVENT + 2
-
-
-def get_font(size):
-    return pygame.font.Font("data/font.ttf", size)
+TICK = 1000 / 60  # мс на шаг симуляции
+MAX_STEPS = 5
+RENDER_SIZE = (1260, 720)  # внутреннее разрешение; окно может быть любым, растягивает SDL
+WORLD_SCALE = {"quality": 1, "performance": 0.5}  # во сколько раз меньше рисуется мир
 
 
 class Game:
-    def __init__(self, size):
+    def __init__(self, size, headless=False, fast_start=False, started=None):
+        # fast_start: сразу заставка, звуки и спрайты догружаются в фоне
+        self.startup = StartupTimer(started)
+        self.startup.mark("imports")
+        self.headless = headless
+        self.fast_start = fast_start
+        self.warm_error = None
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         pygame.init()
         self.width = size[0]
         self.height = size[1]
-        self.screen = pygame.display.set_mode((size[0], size[1]))
+        self.path_to_save = "data/save/save.txt"
+        self.path_to_settings = "data/save/settings.txt"
+        self.settings = Settings(self.path_to_settings)
+        self.save = SaveData(self.path_to_save)
+        self.startup.mark("settings")
+        self.screen = self.open_display(size)
 
         pygame_icon = pygame.image.load("data/icon.png").convert_alpha()
         pygame.display.set_icon(pygame_icon)
         pygame.display.set_caption("Enigma Exit")
+        if not fast_start:
+            load_atlas()
+        self.startup.mark("window")
 
-        self.ground_group = pygame.sprite.Group()
         self.coin_group = pygame.sprite.Group()
-        self.fire_group = pygame.sprite.Group()
         self.key_group = pygame.sprite.Group()
         self.all_sprite = pygame.sprite.Group()
-        self.exit = pygame.sprite.Group()
-        self.rain_group = pygame.sprite.Group()
-        self.weather = Weather(self.rain_group, self.screen, self.width, self.height)
+        self.grid = SpatialGrid(36)
+        self.weather = Weather(self.screen, self.width, self.height)
+        self.camera = Camera((self.width, self.height))
+        # performance: мир рисуется в уменьшенный буфер и растягивается, интерфейс остаётся чётким
+        self.world_scale = WORLD_SCALE.get(self.settings.render_preset, 1)
+        self.world = None
+        if self.world_scale != 1:
+            self.world = pygame.Surface((round(self.width * self.world_scale),
+                                         round(self.height * self.world_scale))).convert()
 
         self.clock = pygame.time.Clock()
+        self.accumulator = 0
         self.coin = 0
         self.levels = {"level_0": "data/levels/level_0.tmx", "level_1": "data/levels/level_1.tmx",
                        "rain": "data/levels/rain.tmx", "sky": "data/levels/sky.tmx"}
-        self.path_to_save = "data/save/save.txt"
-        self.path_to_settings = "data/save/settings.txt"
+        self.preloader = LevelPreloader(self.levels)
+        self.scenes = []
 
+        self.tilemap = None
         self.cur_level = None
         self.spawn_pos = None
         self.player = None
         self.key = False
-        pygame.time.set_timer(ANIM, 200)
-
-        self.sound = SoundModule(SONG_ENDED, (
-            float(self.read_settings()["ui_volume"]), float(self.read_settings()["music_volume"])))
-
-    def load_level(self, name):
+        self.controls = KeyboardInput()
+        self.rng = random.Random()
+        self.recording = None
+        self.replaying = False
+
+        self.sound = SoundModule(SONG_ENDED, (self.settings.ui_volume, self.settings.music_volume),
+                                 music=not headless, fade_ms=self.settings.music_fade_ms, preload=not fast_start)
+        self.startup.mark("sound")
+        self.renderer = DirtyRenderer(self.screen, self.settings.dirty_rendering)
+        self.max_fps = self.settings.max_fps
+        self.record_replays = self.settings.record_replays
+        self.profiler = Profiler()
+        self.overlay = DebugOverlay(self.screen, self.profiler)
+        if self.settings.profile_csv:
+            self.profiler.stream(self.settings.profile_csv)
+            self.profiler.enabled = True
+        self.startup.mark("init")
+
+    def open_display(self, size):
+        settings = self.settings
+        if self.headless or settings.display != "scaled":
+            return pygame.display.set_mode(size)
+        if settings.smooth_scaling:
+            os.environ["SDL_RENDER_SCALE_QUALITY"] = "linear"
+        # SCALED: игра рисует в size, а SDL сам растягивает кадр под окно с полосами по краям;
+        # без integer_scaling окно можно тянуть мышью и масштаб будет дробным
+        flags = pygame.SCALED if settings.integer_scaling else pygame.SCALED | pygame.RESIZABLE
+        try:
+            screen = pygame.display.set_mode(size, flags, vsync=int(settings.vsync))
+        except pygame.error:
+            # нет ускоренного рендерера или vsync - обычное окно один к одному
+            return pygame.display.set_mode(size)
+        if settings.window_scale > 0:
+            from pygame._sdl2.video import Window
+            scale = settings.window_scale
+            if settings.integer_scaling:
+                scale = max(1, int(scale))
+            Window.from_display_module().size = (round(size[0] * scale), round(size[1] * scale))
+        return screen
+
+    def warm_up(self):
+        # идёт в фоновом потоке, пока на экране заставка
+        try:
+            from player import CLIPS
+            from tiles import COIN_CLIP
+            self.sound.load(prefetch=True)
+            self.startup.mark("sounds")
+            load_atlas()
+            for clip in list(CLIPS.values()) + [COIN_CLIP]:
+                load_clip(*clip)
+            self.startup.mark("sprites")
+        except Exception as error:
+            self.warm_error = error
+
+    def warmed_up(self):
+        if self.warm_error is not None:
+            raise self.warm_error
+        self.sound.start()
+        self.startup.mark("ready")
+        # отчёт о запуске только по запросу, bench.py берёт отметки напрямую
+        if os.environ.get("ENIGMA_STARTUP_REPORT"):
+            print(self.startup.report())
+
+    def load_level(self, tmx_data, controls=None):
+        from player import Player
+        from tiles import Coin, Tile
         self.key = False
         self.coin = 0
-        tmx_data = load_pygame(name)
-
-        for layer in tmx_data.visible_layers:
-            if hasattr(layer, 'data'):
-                for x, y, surf in layer.tiles():
-                    pos = (x * 36, y * 36)
-                    if layer.name == "ground":
-                        Tile(pos, surf, self.ground_group, self.all_sprite)
-                    elif layer.name == "ch":
-                        Tile(pos, surf, self.all_sprite)
-                    elif layer.name == "coins":
-                        Coin(pos, self.coin_group, self.all_sprite)
-                    elif layer.name == "fire":
-                        Tile(pos, surf, self.fire_group, self.all_sprite)
-                    elif layer.name == "spawn":
-                        self.spawn_pos = pos
-                    elif layer.name == "key":
-                        Tile(pos, surf, self.key_group, self.all_sprite)
-                    elif layer.name == "exit":
-                        Tile(pos, surf, self.exit, self.all_sprite)
-
-        self.player = Player(self.spawn_pos, self.ground_group, self.screen)
-
-    def update(self, weather_on):
+        self.accumulator = 0
+        anim_clock.reset()
+
+        # тайлы хранятся массивами флагов, картинка собирается по кускам при показе
+        self.tilemap = TileMap(tmx_data, scale=self.world_scale, transparent=self.cur_level == "rain")
+        self.camera.set_world((self.tilemap.pixel_width, self.tilemap.pixel_height))
+
+        for kind, x, y, gid in tmx_data.entities:
+            pos = (x * 36, y * 36)
+            if kind == "coins":
+                self.grid.insert(Coin(pos, self.coin_group, self.all_sprite))
+            elif kind == "key":
+                self.grid.insert(Tile(pos, self.tilemap.image(gid), self.key_group, self.all_sprite))
+        if tmx_data.spawn is not None:
+            self.spawn_pos = (tmx_data.spawn[0] * 36, tmx_data.spawn[1] * 36)
+
+        self.player = Player(self.spawn_pos, self.tilemap, self.screen, controls or self.controls)
+        self.camera.follow(self.player.rect)
+        self.tilemap.prerender(self.camera.view())
+
+    def update(self, weather_on, dt=TICK):
+        # один кадр игры без стека сцен: бенчмарки и отладочные скрипты
+        self.profiler.begin_frame()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.del_level()
-                    self.main_menu()
-
-            if event.type == ANIM:
-                for coin in self.coin_group:
-                    coin.update()
-                self.player.anim()
+                self.quit()
             if event.type == SONG_ENDED:
                 self.sound.play_next_track()
-
-        if self.player.rect.y - 100 > self.height:
+            self.handle_event(event)
+        self.profiler.lap("events")
+        if self.tilemap is not None:
+            self.advance(weather_on, dt)
+        if self.tilemap is not None:
+            self.draw(weather_on)
+        self.profiler.end_frame()
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.save_recording()
+                self.del_level()
+                self.home()
+            if event.key == pygame.K_F3:
+                self.overlay.toggle()
+                self.profiler.enabled = self.overlay.visible or self.profiler.csv is not None
+
+    def advance(self, weather_on, dt):
+        # симуляция идёт фиксированными шагами, сколько бы ни длился кадр
+        self.accumulator = min(self.accumulator + dt, TICK * MAX_STEPS)
+        while self.accumulator >= TICK:
+            outcome = self.step(weather_on)
+            self.accumulator -= TICK
+            if outcome is not None:
+                self.finish(outcome)
+                return
+
+    def finish(self, outcome):
+        self.save_recording()
+        self.del_level()
+        if outcome == "win":
+            self.replace(WinScene(self))
+        elif outcome == "restart":
+            self.replace(RestartScene(self))
+
+    def step(self, weather_on):
+        if anim_clock.tick():
+            self.player.anim()
+        self.profiler.lap("anim")
+
+        if self.player.rect.y - 100 > self.tilemap.pixel_height:
             if self.player.life == 1:
                 self.player.restart = True
             else:
-                self.player.rect.x, self.player.rect.y = self.spawn_pos
+                self.player.teleport(self.spawn_pos)
                 self.player.hiting()
 
-        for coin in self.coin_group:
+        for coin in self.grid.query(self.player.rect, self.coin_group):
             if coin.update_collide(self.player):
                 self.coin += 1
-                self.sound.coin.play()
+                self.sound.play("coin")
 
-        if pygame.sprite.spritecollide(self.player, self.key_group, True):
+        for key in self.grid.collide(self.player.rect, self.key_group):
+            key.kill()
             self.key = True
-        if pygame.sprite.spritecollide(self.player, self.exit, False) and self.key:
-            self.del_level()
-            self.win_screen()
-        if pygame.sprite.spritecollide(self.player, self.fire_group,
-                                       False) and not self.player.hit and not self.player.death:
+        if self.tilemap.collide(self.player.rect, EXIT) and self.key:
+            return "win"
+        if self.tilemap.collide(self.player.rect, FIRE) and not self.player.hit and not self.player.death:
             self.player.hiting()
         if self.player.restart:
-            self.del_level()
-            self.restart_screen()
+            return "restart"
+        self.profiler.lap("coins")
 
-        self.screen.fill('black')
         if weather_on:
             self.weather.update()
-            for i in self.rain_group:
-                i.update()
-        self.all_sprite.draw(self.screen)
+        self.profiler.lap("weather")
         self.player.update()
-        pygame.display.update()
-
-    def play(self, level):
-        self.load_level(self.levels[level])
-        weather_on = False
-        if level == "rain":
-            weather_on = True
-
-        while True:
-            self.clock.tick(60)
-            self.update(weather_on=weather_on)
-
-    def del_level(self):
-        for sprite in self.all_sprite:
-            sprite.kill()
-
-    def main_menu(self):
-        while True:
-            self.screen.fill('black')
-            size_buttons = (184, 56)
-
-            menu_mouse_pos = pygame.mouse.get_pos()
-
-            menu_text = get_font(100).render("ENIGMA EXIT", True, "#b68f40")
-            menu_rect = menu_text.get_rect(center=(self.width // 2, 100))
-
-            play_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2 - self.height * 0.1),
-                text_input="Play", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-            options_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2),
-                text_input="Options", font=get_font(75), base_color="#d7fcd4",
-                hovering_color="White")
-            help_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.1),
-                text_input="Help", font=get_font(75), base_color="#d7fcd4",
-                hovering_color="White")
-            quit_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.2),
-                text_input="Quit", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            self.screen.blit(menu_text, menu_rect)
-
-            for button in [play_button, options_button, help_button, quit_button]:
-                button.changeColor(menu_mouse_pos)
-                button.update(self.screen)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if play_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.levels_screen()
-                    if options_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.options()
-                    if help_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.help()
-                    if quit_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        pygame.quit()
-                        sys.exit()
-                if event.type == SONG_ENDED:
-                    self.sound.play_next_track()
-
-            pygame.display.update()
-
-    def options(self):
-        ui_volume, music_volume = float(self.read_settings()["ui_volume"]), float(self.read_settings()["music_volume"])
-        while True:
-            options_mouse_pos = pygame.mouse.get_pos()
-
-            self.screen.fill("black")
-
-            music_volume_text = get_font(60).render("Music volume", True, "white")
-            music_volume_rect = music_volume_text.get_rect(center=(self.width // 2 - 200, self.height // 2 - 100))
-            self.screen.blit(music_volume_text, music_volume_rect)
-            ui_volume_text = get_font(60).render("UI volume", True, "white")
-            ui_volume_rect = ui_volume_text.get_rect(center=(self.width // 2 - 220, self.height // 2))
-            self.screen.blit(ui_volume_text, ui_volume_rect)
-
-            music_volume_text = get_font(45).render(str(music_volume), True, "white")
-            music_volume_rect = music_volume_text.get_rect(center=(self.width // 2, self.height // 2 - 100))
-            self.screen.blit(music_volume_text, music_volume_rect)
-            ui_volume_text = get_font(45).render(str(ui_volume), True, "white")
-            ui_volume_rect = ui_volume_text.get_rect(center=(self.width // 2, self.height // 2))
-            self.screen.blit(ui_volume_text, ui_volume_rect)
-
-            plus_music_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button_small.png").convert_alpha(),
-                                             (56, 56)),
-                pos=(self.width // 2 + 56, self.height // 2 - 95),
-                text_input="+", font=get_font(75), base_color="#d7fcd4", hovering_color="White", shiftx=2, shifty=-8)
-            minus_music_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button_small.png").convert_alpha(),
-                                             (56, 56)),
-                pos=(self.width // 2 - 56, self.height // 2 - 95),
-                text_input="-", font=get_font(75), base_color="#d7fcd4", hovering_color="White", shiftx=2, shifty=-8)
-            plus_music_button.changeColor(options_mouse_pos)
-            minus_music_button.changeColor(options_mouse_pos)
-            plus_music_button.update(self.screen)
-            minus_music_button.update(self.screen)
-
-            plus_ui_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button_small.png").convert_alpha(),
-                                             (56, 56)),
-                pos=(self.width // 2 + 56, self.height // 2 + 5),
-                text_input="+", font=get_font(75), base_color="#d7fcd4", hovering_color="White", shiftx=2, shifty=-8)
-            minus_ui_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button_small.png").convert_alpha(),
-                                             (56, 56)),
-                pos=(self.width // 2 - 56, self.height // 2 + 5),
-                text_input="-", font=get_font(75), base_color="#d7fcd4", hovering_color="White", shiftx=2, shifty=-8)
-            plus_ui_button.changeColor(options_mouse_pos)
-            minus_ui_button.changeColor(options_mouse_pos)
-            plus_ui_button.update(self.screen)
-            minus_ui_button.update(self.screen)
-
-            options_back = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.2),
-                text_input="Back", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            options_back.changeColor(options_mouse_pos)
-            options_back.update(self.screen)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if plus_music_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        if music_volume < 1.0:
-                            music_volume = float('{:.1f}'.format(music_volume + 0.1))
-                            self.sound.set_volume_music(music_volume)
-                    if minus_music_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        if music_volume > 0.0:
-                            music_volume = float('{:.1f}'.format(music_volume - 0.1))
-                            self.sound.set_volume_music(music_volume)
-
-                    if plus_ui_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        if ui_volume < 1.0:
-                            ui_volume = float('{:.1f}'.format(ui_volume + 0.1))
-                            self.sound.set_volume_ui(ui_volume)
-                    if minus_ui_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        if ui_volume > 0.0:
-                            ui_volume = float('{:.1f}'.format(ui_volume - 0.1))
-                            self.sound.set_volume_ui(ui_volume)
-
-                    if options_back.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.write_settings({"ui_volume": ui_volume, "music_volume": music_volume})
-                        self.main_menu()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.write_settings({"ui_volume": ui_volume, "music_volume": music_volume})
-                        self.main_menu()
-                if event.type == SONG_ENDED:
-                    self.sound.play_next_track()
-
-            pygame.display.update()
-
-    def restart_screen(self):
-        while True:
-            options_mouse_pos = pygame.mouse.get_pos()
-
-            self.screen.fill("black")
-
-            options_text = get_font(45).render("GAME OVER.", True, "white")
-            options_rect = options_text.get_rect(center=(self.width // 2, self.height // 2))
-            self.screen.blit(options_text, options_rect)
-
-            restart_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.2),
-                text_input="Restart", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            back_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (220, 56)),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.35),
-                text_input="Main menu", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            restart_button.changeColor(options_mouse_pos)
-            restart_button.update(self.screen)
-
-            back_button.changeColor(options_mouse_pos)
-            back_button.update(self.screen)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if restart_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.play(self.cur_level)
-                    if back_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.main_menu()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.main_menu()
-                if event.type == SONG_ENDED:
-                    self.sound.play_next_track()
-
-            pygame.display.update()
-
-    def win_screen(self):
-        score = 0
-        self.screen.fill("black")
-        pygame.display.update()
-
-        coin_sprite = pygame.transform.scale(pygame.image.load("data/sprites/coin/5.png").convert_alpha(), (64, 64))
-        pos_rot_coins = []
-        for i in range(self.coin):
-            pygame.time.delay(250)
-            pos_rot_coins.append(
-                (200 + 22 * i + randint(-7, 7), self.height // 2 - 100 + randint(-4, 4), randint(-75, 75)))
-            self.screen.blit(pygame.transform.rotate(coin_sprite, pos_rot_coins[-1][2]),
-                             (pos_rot_coins[-1][0], pos_rot_coins[-1][1]))
-            pygame.display.update()
-            self.sound.coin.play()
-
-        life_sprite_0 = pygame.transform.scale(pygame.image.load("data/sprites/ui/0.png").convert_alpha(), (64, 56))
-        life_sprite_1 = pygame.transform.scale(pygame.image.load("data/sprites/ui/1.png").convert_alpha(), (64, 56))
-        for i in range(1, 4):
-            pygame.time.delay(400)
-            if i <= self.player.life:
-                self.screen.blit(life_sprite_0, (130 + 70 * i, self.height // 2))
+        self.profiler.lap("player")
+        return None
+
+    def draw(self, weather_on, alpha=None):
+        if alpha is None:
+            alpha = self.accumulator / TICK
+        if self.world is not None:
+            return self.draw_scaled(weather_on, alpha)
+        if self.camera.follow(self.player.interpolate(alpha)):
+            self.renderer.invalidate()
+        # дождь под тайлами: между заливкой фона и слоем карты
+        rain = self.renderer.clear(self.draw_world, lambda: self.weather.draw(alpha) if weather_on else None)
+        self.renderer.mark(rain)
+        self.profiler.lap("draw")
+        # рисуем только то, что попало в окно
+        sprites = self.grid.query(self.camera.view(), self.all_sprite)
+        self.renderer.mark(*self.screen.blits([(sprite.image, self.camera.apply(sprite.rect)) for sprite in sprites]))
+        self.player.draw(self.camera.offset)
+        self.renderer.mark(*self.player.dirty)
+        self.profiler.lap("draw")
+        # счётчики недешёвые, считаем их только при открытом F3
+        if self.overlay.visible:
+            self.renderer.mark(self.overlay.draw(self.clock.get_fps(), self.sprite_counts()))
+        self.profiler.lap("overlay")
+        self.renderer.present()
+        self.profiler.lap("present")
+
+    def draw_scaled(self, weather_on, alpha):
+        # грязные прямоугольники тут не помогают: растянутый мир всё равно меняет весь экран
+        scale = self.world_scale
+        self.camera.follow(self.player.interpolate(alpha))
+        offset = self.camera.offset
+        self.world.fill((0, 0, 0))
+        if weather_on:
+            self.weather.draw(alpha, self.world, scale)
+        self.profiler.lap("weather")
+        self.tilemap.draw(self.world, offset)
+        sprites = self.grid.query(self.camera.view(), self.all_sprite)
+        self.world.blits([(assets.scaled(sprite.image, scale),
+                           (int((sprite.rect.x - offset[0]) * scale), int((sprite.rect.y - offset[1]) * scale)))
+                          for sprite in sprites], doreturn=False)
+        rect = self.player.draw_scaled(self.world, offset, scale)
+        pygame.transform.scale(self.world, (self.width, self.height), self.screen)
+        self.profiler.lap("draw")
+        if self.player.hit:
+            self.player.render_life(rect.center)
+        if self.overlay.visible:
+            self.overlay.draw(self.clock.get_fps(), self.sprite_counts())
+        self.profiler.lap("overlay")
+        self.renderer.invalidate()
+        self.renderer.present()
+        self.profiler.lap("present")
+
+    def draw_world(self, area):
+        self.tilemap.draw(self.screen, self.camera.offset, area)
+
+    def sprite_counts(self):
+        return {"tiles": self.tilemap.tile_count, "chunks": len(list(self.tilemap.chunks_in(self.camera.view()))),
+                "coins": len(self.coin_group), "rain": self.weather.count(), "all_sprite": len(self.all_sprite)}
+
+    def start_level(self, level):
+        self.cur_level = level
+        seed = random.getrandbits(32)
+        self.seed(seed)
+        self.replaying = False
+        self.save.level(level).attempts += 1
+        self.save.changed()
+        controls = self.controls
+        if self.record_replays:
+            controls = RecordingInput(self.controls)
+            self.recording = Recording(level, seed, controls.log)
+        self.load_level(self.preloader.get(level), controls)
+
+    def start_replay(self, recording, seek=0):
+        self.cur_level = recording.level
+        self.seed(recording.seed)
+        self.replaying = True
+        self.load_level(self.preloader.get(recording.level), ReplayInput(recording.log))
+        weather_on = recording.level == "rain"
+        # перемотка без отрисовки до нужного шага
+        for _ in range(seek):
+            outcome = self.step(weather_on)
+            if outcome is not None:
+                self.finish(outcome)
+                return
+
+    def push(self, scene):
+        self.scenes.append(scene)
+        scene.enter()
+
+    def pop(self):
+        self.scenes.pop()
+        if self.scenes:
+            self.scenes[-1].resume()
+
+    def replace(self, scene):
+        if self.scenes:
+            self.scenes.pop()
+        self.push(scene)
+
+    def home(self):
+        self.scenes.clear()
+        self.push(MainMenuScene(self))
+
+    def run(self, scene=None):
+        # единственный цикл игры: события и кадр достаются сцене на вершине стека
+        if scene is not None:
+            self.push(scene)
+        elif not self.scenes:
+            if self.fast_start:
+                self.push(SplashScene(self))
             else:
-                self.screen.blit(life_sprite_1, (130 + 70 * i, self.height // 2))
-            pygame.display.update()
-
-        new_result = self.read_result()
-        if int(new_result[self.cur_level][0]) < (100 * self.coin) * self.player.life:
-            new_result[self.cur_level][0] = (100 * self.coin) * self.player.life
-        self.write_result(new_result)
-
-        while True:
-            options_mouse_pos = pygame.mouse.get_pos()
-
-            self.screen.fill("black")
-
-            options_text = get_font(60).render("WIN.", True, "white")
-            options_rect = options_text.get_rect(center=(self.width // 2, self.height // 2))
-            self.screen.blit(options_text, options_rect)
-
-            coin_text = get_font(80).render(f"x{self.coin}.", True, "white")
-            coin_rect = coin_text.get_rect(topleft=(pos_rot_coins[-1][0] + 100, self.height // 2 - 100))
-            self.screen.blit(coin_text, coin_rect)
-
-            life_text = get_font(80).render(f"x{self.player.life}.", True, "white")
-            life_rect = life_text.get_rect(topleft=(194 + 75 * 3, self.height // 2))
-            self.screen.blit(life_text, life_rect)
-
-            score_text = get_font(80).render(f"Score: {score}", True, "white")
-            score_rect = score_text.get_rect(center=(self.width // 2 - 100, 200))
-            self.screen.blit(score_text, score_rect)
-
-            back_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (220, 56)),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.2),
-                text_input="Main menu", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            back_button.changeColor(options_mouse_pos)
-            back_button.update(self.screen)
-
-            for x, y, r in pos_rot_coins:
-                self.screen.blit(pygame.transform.rotate(coin_sprite, r), (x, y))
-
-            for i in range(1, 4):
-                if i <= self.player.life:
-                    self.screen.blit(life_sprite_0, (130 + 70 * i, self.height // 2))
-                else:
-                    self.screen.blit(life_sprite_1, (130 + 70 * i, self.height // 2))
-
+                self.home()
+        while self.scenes:
+            dt = self.clock.tick(self.max_fps)
+            scene = self.scenes[-1]
+            self.profiler.begin_frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if back_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.main_menu()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.main_menu()
+                    self.quit()
                 if event.type == SONG_ENDED:
                     self.sound.play_next_track()
+                if scene is self.scenes[-1]:
+                    scene.handle_event(event)
+            self.profiler.lap("events")
+            if scene is self.scenes[-1]:
+                scene.update(dt)
+            if scene is self.scenes[-1]:
+                scene.draw()
+                if "first frame" not in self.startup.marks:
+                    self.startup.mark("first frame")
+            self.profiler.end_frame()
+
+    def quit(self):
+        self.profiler.close()
+        self.settings.flush()
+        self.save.flush()
+        pygame.quit()
+        sys.exit()
+
+    def seed(self, seed):
+        self.rng.seed(seed)
+        self.weather.seed(seed)
+
+    def save_recording(self):
+        if self.recording is None:
+            return
+        name = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{self.recording.level}.rep"
+        recording, self.recording = self.recording, None
+        try:
+            recording.save(os.path.join(REPLAYS_DIR, name))
+            prune_replays()
+        except OSError as error:
+            # повтор - не повод ронять игру: папка только для чтения или диск полон
+            print(f"replay not saved: {error}", file=sys.stderr)
+
+    def simulate(self, level, controls, max_ticks=60 * 60 * 5, seed=0):
+        self.seed(seed)
+        self.load_level(self.preloader.get(level), controls)
+        weather_on = level == "rain"
+        outcome = None
+        ticks = 0
+        while outcome is None and ticks < max_ticks:
+            outcome = self.step(weather_on)
+            ticks += 1
+        result = {"level": level, "outcome": outcome or "timeout", "ticks": ticks, "coins": self.coin,
+                  "life": self.player.life}
+        self.del_level()
+        return result
 
-            if score < (100 * self.coin) * self.player.life:
-                pygame.time.delay(80)
-                score += 100
-
-            pygame.display.update()
-
-    def levels_screen(self):
-        result = self.read_result()
-        while True:
-            options_mouse_pos = pygame.mouse.get_pos()
-
-            self.screen.fill("black")
-
-            options_text = get_font(80).render("Select level", True, "white")
-            options_rect = options_text.get_rect(center=(self.width // 2, 40))
-            self.screen.blit(options_text, options_rect)
-
-            back_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.3),
-                text_input="Back", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            reset_result = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (200, 56)),
-                pos=(self.width - 100, 28),
-                text_input="Reset result", font=get_font(60), base_color="#d7fcd4", hovering_color="Red")
-
-            level_0 = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2 - 200, self.height // 2 - self.height * 0.1),
-                text_input="level 1", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-            level_1 = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2 - 200, self.height // 2),
-                text_input="level 2", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            level_rain = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2 - 200, self.height // 2 + self.height * 0.1),
-                text_input="rain", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            level_sky = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             (184, 56)),
-                pos=(self.width // 2 - 200, self.height // 2 + self.height * 0.2),
-                text_input="sky", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            for button in [back_button, level_sky, level_rain, level_1, level_0, reset_result]:
-                button.changeColor(options_mouse_pos)
-                button.update(self.screen)
-
-            score_text_0 = get_font(80).render(f"{result['level_0'][0]}/{result['level_0'][1]}", True, "white")
-            score_rect_0 = score_text_0.get_rect(
-                center=(self.width // 2 - 10, self.height // 2 - self.height * 0.1 - 10))
-            self.screen.blit(score_text_0, score_rect_0)
-
-            score_text_1 = get_font(80).render(f"{result['level_1'][0]}/{result['level_1'][1]}", True, "white")
-            score_rect_1 = score_text_1.get_rect(center=(self.width // 2 - 10, self.height // 2 - 10))
-            self.screen.blit(score_text_1, score_rect_1)
-
-            score_text_rain = get_font(80).render(f"{result['rain'][0]}/{result['rain'][1]}", True, "white")
-            score_rect_rain = score_text_rain.get_rect(
-                center=(self.width // 2 - 10, self.height // 2 + self.height * 0.1 - 10))
-            self.screen.blit(score_text_rain, score_rect_rain)
-
-            score_text_sky = get_font(80).render(f"{result['sky'][0]}/{result['sky'][1]}", True, "white")
-            score_rect_sky = score_text_sky.get_rect(
-                center=(self.width // 2 - 10, self.height // 2 + self.height * 0.2 - 10))
-            self.screen.blit(score_text_sky, score_rect_sky)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if level_0.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.cur_level = "level_0"
-                        self.play(self.cur_level)
-                    if level_1.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.cur_level = "level_1"
-                        self.play(self.cur_level)
-                    if level_rain.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.cur_level = "rain"
-                        self.play(self.cur_level)
-                    if level_sky.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.cur_level = "sky"
-                        self.play(self.cur_level)
-                    if back_button.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.main_menu()
-                    if reset_result.checkForInput(options_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.reset_save()
-                        result = self.read_result()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.main_menu()
-                if event.type == SONG_ENDED:
-                    self.sound.play_next_track()
-
-            pygame.display.update()
-
-    def help(self):
-        arrowright = pygame.transform.scale(pygame.image.load("data/sprites/ui/ARROWRIGHT.png").convert_alpha(),
-                                            (64, 64))
-        arrowleft = pygame.transform.scale(pygame.image.load("data/sprites/ui/ARROWLEFT.png").convert_alpha(),
-                                           (64, 64))
-        arrowup = pygame.transform.scale(pygame.image.load("data/sprites/ui/ARROWUP.png").convert_alpha(),
-                                         (64, 64))
-        coin_sprite = pygame.transform.scale(pygame.image.load("data/sprites/coin/5.png").convert_alpha(), (64, 64))
-        key_sprite = pygame.transform.scale(pygame.image.load("data/sprites/ui/key.png").convert_alpha(), (64, 64))
-        exit_sprite = pygame.transform.scale(pygame.image.load("data/sprites/ui/exit.png").convert_alpha(), (64, 64))
-        while True:
-            self.screen.fill('black')
-            size_buttons = (184, 56)
-
-            menu_mouse_pos = pygame.mouse.get_pos()
-
-            self.screen.blit(arrowleft, (240, 250))
-            self.screen.blit(arrowright, (368, 250))
-            self.screen.blit(arrowup, (304, 186))
-
-            text = get_font(200).render(">", True, "white")
-            rect = text.get_rect(center=(490, 225))
-            self.screen.blit(text, rect)
-            self.screen.blit(coin_sprite, (540, 225))
-
-            text = get_font(200).render(">", True, "white")
-            rect = text.get_rect(center=(662, 225))
-            self.screen.blit(text, rect)
-            self.screen.blit(key_sprite, (712, 225))
-
-            text = get_font(200).render(">", True, "white")
-            rect = text.get_rect(center=(834, 225))
-            self.screen.blit(text, rect)
-            self.screen.blit(exit_sprite, (884, 225))
-
-            back_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.3),
-                text_input="Back", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            github_button = Button(
-                image=pygame.transform.scale(pygame.image.load("data/sprites/ui/button.png").convert_alpha(),
-                                             size_buttons),
-                pos=(self.width // 2, self.height // 2 + self.height * 0.2),
-                text_input="Github", font=get_font(75), base_color="#d7fcd4", hovering_color="White")
-
-            for button in [back_button, github_button]:
-                button.changeColor(menu_mouse_pos)
-                button.update(self.screen)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if github_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        webbrowser.open("https://github.com/addfd/EnigmaExit")
-                    if back_button.checkForInput(menu_mouse_pos):
-                        self.sound.ui_click.play()
-                        self.main_menu()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.main_menu()
-                if event.type == SONG_ENDED:
-                    self.sound.play_next_track()
-
-            pygame.display.update()
-
-    def read_result(self):
-        with open(self.path_to_save) as save:
-            result = save.read().splitlines()
-            re = {line.split()[0]: [line.split()[1], line.split()[2]] for line in result}
-        return re
-
-    def write_result(self, new_save):
-        with open(self.path_to_save, "w") as save:
-            for level, value in new_save.items():
-                save.write(f"{level} {value[0]} {value[1]}\n")
-
-    def reset_save(self):
-        self.write_result({level: [0, value[1]] for level, value in self.read_result().items()})
-
-    def read_settings(self):
-        with open(self.path_to_settings) as settings:
-            result = settings.read().splitlines()
-            re = {line.split("=")[0]: line.split("=")[1] for line in result}
-        return re
-
-    def write_settings(self, new_settings):
-        cur_settings = self.read_settings()
-        for name, sett in new_settings.items():
-            cur_settings[name] = sett
-        with open(self.path_to_settings, "w") as settings:
-            for name, sett in cur_settings.items():
-                settings.write(f"{name}={sett}\n")
+    def del_level(self):
+        for sprite in self.all_sprite:
+            sprite.kill()
+        self.grid.clear()
+        self.weather.clear()
+        self.tilemap = None
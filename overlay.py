@@ -0,0 +1,56 @@
+import pygame
+from fonts import render_text
+from profiler import PHASES
+
+
+class DebugOverlay:
+    def __init__(self, screen, profiler, size=(300, 330)):
+        self.screen = screen
+        self.profiler = profiler
+        self.visible = False
+        self.panel = pygame.Surface(size, pygame.SRCALPHA)
+        self.rect = self.panel.get_rect(topleft=(10, 10))
+        self.graph = pygame.Rect(10, 40, size[0] - 20, 60)
+        self.lines = []
+        self.timer = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.timer = 0
+
+    def refresh(self, fps, counts):
+        samples = list(self.profiler.history)[-60:]
+        self.lines = [f"FPS: {fps:.0f}"]
+        self.lines += [f"{name}: {count}" for name, count in counts.items()]
+        for phase in PHASES:
+            average = sum(sample.get(phase, 0) for sample in samples) / max(len(samples), 1)
+            self.lines.append(f"{phase}: {average * 1000:.2f} ms")
+
+    def draw(self, fps, counts):
+        if not self.visible:
+            return None
+
+        # текст обновляем пару раз в секунду, чтобы не рендерить строки каждый кадр
+        self.timer -= 1
+        if self.timer <= 0:
+            self.refresh(fps, counts)
+            self.timer = 30
+
+        self.panel.fill((0, 0, 0, 180))
+        self.panel.blit(render_text(self.lines[0], 30, "white"), (10, 5))
+
+        # график времени кадра, верхняя граница 33 мс
+        pygame.draw.rect(self.panel, (80, 80, 80), self.graph, 1)
+        samples = list(self.profiler.history)[-self.graph.width:]
+        if len(samples) > 1:
+            points = []
+            for i, sample in enumerate(samples):
+                height = min(sample["frame"] * 1000 / 33, 1) * self.graph.height
+                points.append((self.graph.left + i, self.graph.bottom - 1 - height))
+            pygame.draw.lines(self.panel, (0, 220, 0), False, points)
+        budget = self.graph.bottom - 16.7 / 33 * self.graph.height
+        pygame.draw.line(self.panel, (220, 0, 0), (self.graph.left, budget), (self.graph.right - 1, budget))
+
+        for i, line in enumerate(self.lines[1:]):
+            self.panel.blit(render_text(line, 22, "white"), (10, 105 + i * 16))
+        return self.screen.blit(self.panel, self.rect)
@@ -0,0 +1,57 @@
+import math
+from tilemap import SOLID
+
+JUMP_FORCE = 16
+SPEED = 3
+MAX_STEP = 18  # больше за подшаг нельзя, иначе можно проскочить тайл
+MAX_FALL = 8
+FALL_SPEED = 10
+
+
+def step(tilemap, state, size, left, right, jump):
+    # один тик движения игрока без спрайтов; state - (x, y, vel_y, in_air, jumped).
+    # Этим же шагом пользуется analyser, так что проверка уровней не расходится с игрой
+    x, y, vel_y, in_air, jumped = state
+    if jump and not jumped and not in_air:
+        vel_y = -JUMP_FORCE
+        jumped = True
+    if not jump:
+        jumped = False
+    dx = (SPEED if right else 0) - (SPEED if left else 0)
+
+    # gravity
+    vel_y += 1
+    if vel_y > MAX_FALL:
+        vel_y = FALL_SPEED
+    dy = vel_y
+
+    # collision
+    in_air = True
+    width, height = size
+    tile = tilemap.tile_size
+    steps = max(1, math.ceil(max(abs(dx), abs(dy)) / MAX_STEP))
+    steps_x = [dx * (i + 1) // steps - dx * i // steps for i in range(steps)]
+    steps_y = [dy * (i + 1) // steps - dy * i // steps for i in range(steps)]
+    blocked_x = blocked_y = False
+    for dx, dy in zip(steps_x, steps_y):
+        if blocked_x:
+            dx = 0
+        if blocked_y:
+            dy = 0
+        union = (min(x, x + dx), min(y, y + dy), max(x, x + dx) + width, max(y, y + dy) + height)
+        for tx, ty in tilemap.cells(*union, SOLID):
+            if x + dx < tx + tile and x + dx + width > tx and y < ty + tile and y + height > ty:
+                dx = 0
+                blocked_x = True
+            if x < tx + tile and x + width > tx and y + dy < ty + tile and y + dy + height > ty:
+                blocked_y = True
+                if vel_y < 0:
+                    dy = ty + tile - y
+                    vel_y = 0
+                elif vel_y >= 0:
+                    dy = ty - (y + height)
+                    vel_y = 0
+                    in_air = False
+        x += dx
+        y += dy
+    return x, y, vel_y, in_air, jumped
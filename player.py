@@ -1,27 +1,26 @@
-import pygame
+import physics
+from assets import assets
+from animation import load_clip
+from timeline import Timeline
 
-
-def load_anim(type, count, size):
-    anim = []
-    for name in range(count):
-        anim.append(pygame.transform.scale(pygame.image.load(f'data/sprites/{type}/{name}.png').convert_alpha(), size))
-    return anim
+CLIPS = {"hit": ("player/hit", 2, (21, 48)), "idle": ("player/idle", 6, (24, 48)), "run": ("player/run", 8, (27, 48)),
+         "jump": ("player/jump", 4, (27, 48)), "fall": ("player/fall", 4, (36, 45)),
+         "death": ("player/death", 12, (24, 48))}
 
 
 class Player():
-    def __init__(self, pos, world, screen):
+    def __init__(self, pos, tilemap, screen, controls):
         self.screen = screen
+        self.controls = controls
 
-        self.hit_frames = load_anim("player/hit", 2, (21, 48))
-        self.state = {"idle": load_anim("player/idle", 6, (24, 48)), "run": load_anim("player/run", 8, (27, 48)),
-                      "jump": load_anim("player/jump", 4, (27, 48)), "fall": load_anim("player/fall", 4, (36, 45)),
-                      "death": load_anim("player/death", 12, (24, 48))}
+        self.hit_frames = load_clip(*CLIPS["hit"])
+        self.state = {name: load_clip(*CLIPS[name]) for name in ("idle", "run", "jump", "fall", "death")}
 
         self.cur_frame = 0
         self.cur_state = "idle"
-        self.image = self.state[self.cur_state][self.cur_frame]
+        self.image = self.state[self.cur_state].frame(self.cur_frame)
 
-        self.world = world
+        self.tilemap = tilemap
 
         self.rect = self.image.get_rect()
         self.rect.x = pos[0]
@@ -30,14 +29,14 @@ class Player():
         self.height = self.image.get_height()
         self.vel_y = 0
 
-        self.jump_force = 16
-        self.speed = 3
         self.time_no_hit = 120  # ~2 c
         self.timehit = 0
+        self.hit_flash = 6  # ~100 мс
+        self.death_hold = 6
+        self.timeline = Timeline()
 
         self.life = 3
-        self.life_sprite = [pygame.transform.scale(pygame.image.load('data/sprites/ui/0.png').convert_alpha(), (10, 9)),
-                            pygame.transform.scale(pygame.image.load('data/sprites/ui/1.png').convert_alpha(), (10, 9))]
+        self.life_sprite = [assets.get('data/sprites/ui/0.png', (10, 9)), assets.get('data/sprites/ui/1.png', (10, 9))]
 
         self.in_air = False
         self.move = False
@@ -46,58 +45,30 @@ class Player():
         self.hit = False
         self.death = False
         self.restart = False
+        self.prev_pos = self.rect.topleft
+        self.draw_rect = self.rect.copy()
+        self.dirty = []
 
     def update(self):
+        self.prev_pos = self.rect.topleft
+        self.timeline.update(1)
         if not self.death:
-            dx = 0
-            dy = 0
-
-            key = pygame.key.get_pressed()
-            if key[pygame.K_UP] and self.jumped == False and self.in_air == False:
-                self.vel_y = -self.jump_force
-                self.jumped = True
-            if key[pygame.K_UP] == False:
-                self.jumped = False
-            if key[pygame.K_LEFT]:
-                dx -= self.speed
+            controls = self.controls.read()
+            if controls.left:
                 self.move = True
                 self.flip = True
-            if key[pygame.K_RIGHT]:
-                dx += self.speed
+            if controls.right:
                 self.move = True
                 self.flip = False
-            if key[pygame.K_LEFT] == False and key[pygame.K_RIGHT] == False:
+            if controls.left == False and controls.right == False:
                 self.move = False
 
-            # gravity
-            self.vel_y += 1
-            if self.vel_y > 8:
-                self.vel_y = 10
-            dy += self.vel_y
-
-            # collision
-            self.in_air = True
-            for tile in self.world:
-                tile = tile.rect
-                if tile.colliderect(self.rect.x + dx, self.rect.y, self.width, self.height):
-                    dx = 0
-                if tile.colliderect(self.rect.x, self.rect.y + dy, self.width, self.height):
-                    if self.vel_y < 0:
-                        dy = tile.bottom - self.rect.top
-                        self.vel_y = 0
-                    elif self.vel_y >= 0:
-                        dy = tile.top - self.rect.bottom
-                        self.vel_y = 0
-                        self.in_air = False
-
-            self.rect.x += dx
-            self.rect.y += dy
-
-        self.screen.blit(self.image, self.rect)
-        # pygame.draw.rect(self.screen, (255, 255, 255), self.rect, 2)
+            state = (self.rect.x, self.rect.y, self.vel_y, self.in_air, self.jumped)
+            state = physics.step(self.tilemap, state, (self.width, self.height), controls.left, controls.right,
+                                 controls.jump)
+            self.rect.x, self.rect.y, self.vel_y, self.in_air, self.jumped = state
 
         if self.hit:
-            self.render_life()
             self.timehit += 1
             if self.timehit >= self.time_no_hit:
                 self.hit = False
@@ -107,13 +78,40 @@ class Player():
                     self.cur_state = "death"
                     self.cur_frame = -1
 
+    def interpolate(self, alpha=1.0):
+        # позиция между двумя шагами симуляции
+        self.draw_rect.x = round(self.prev_pos[0] + (self.rect.x - self.prev_pos[0]) * alpha)
+        self.draw_rect.y = round(self.prev_pos[1] + (self.rect.y - self.prev_pos[1]) * alpha)
+        return self.draw_rect
+
+    def draw(self, offset=(0, 0)):
+        rect = self.draw_rect.move(-offset[0], -offset[1])
+        self.dirty = [self.screen.blit(self.image, rect)]
+        # pygame.draw.rect(self.screen, (255, 255, 255), self.rect, 2)
+
+        if self.hit:
+            self.render_life(rect.center)
+
+    def draw_scaled(self, surface, offset, scale):
+        # мир в низком разрешении: сам игрок туда, а жизни потом поверх в полном
+        image = assets.scaled(self.image, scale)
+        surface.blit(image, (int((self.draw_rect.x - offset[0]) * scale), int((self.draw_rect.y - offset[1]) * scale)))
+        self.dirty = []
+        return self.draw_rect.move(-offset[0], -offset[1])
+
+    def teleport(self, pos):
+        self.rect.topleft = pos
+        self.prev_pos = pos
+
     def anim(self):
         if self.death:
+            if self.cur_frame == len(self.state["death"]) - 1:
+                return
             self.cur_frame += 1
-            self.image = pygame.transform.flip(self.state[self.cur_state][self.cur_frame], self.flip, False)
-            if self.cur_frame == 11:
-                pygame.time.delay(100)
-                self.restart = True
+            self.image = self.state[self.cur_state].frame(self.cur_frame, self.flip)
+            if self.cur_frame == len(self.state["death"]) - 1:
+                # последний кадр смерти ещё немного висит на экране
+                self.timeline.after(self.death_hold, self.finish_death)
         else:
             if self.in_air and self.jumped:
                 self.cur_state = "jump"
@@ -125,21 +123,25 @@ class Player():
                 self.cur_state = "idle"
 
             self.cur_frame = (self.cur_frame + 1) % len(self.state[self.cur_state])
-            self.image = pygame.transform.flip(self.state[self.cur_state][self.cur_frame], self.flip, False)
+            self.image = self.state[self.cur_state].frame(self.cur_frame, self.flip)
 
     def hiting(self):
         self.hit = True
         self.life -= 1
-        self.image = pygame.transform.flip(self.hit_frames[0], self.flip, False)
-        pygame.time.delay(100)
-        self.image = pygame.transform.flip(self.hit_frames[1], self.flip, False)
+        self.image = self.hit_frames.frame(0, self.flip)
+        self.timeline.after(self.hit_flash, self.end_hit_flash)
         if self.life == 0:
             self.time_no_hit = 40
 
-    def render_life(self):
-        pos = self.rect.center
+    def end_hit_flash(self):
+        self.image = self.hit_frames.frame(1, self.flip)
+
+    def finish_death(self):
+        self.restart = True
+
+    def render_life(self, pos):
         for i in range(1, 4):
             if i <= self.life:
-                self.screen.blit(self.life_sprite[0], (pos[0] - 25 + 11 * i, pos[1] - 40))
+                self.dirty.append(self.screen.blit(self.life_sprite[0], (pos[0] - 25 + 11 * i, pos[1] - 40)))
             else:
-                self.screen.blit(self.life_sprite[1], (pos[0] - 25 + 11 * i, pos[1] - 40))
+                self.dirty.append(self.screen.blit(self.life_sprite[1], (pos[0] - 25 + 11 * i, pos[1] - 40)))
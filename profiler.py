@@ -0,0 +1,70 @@
+import time
+from collections import deque
+
+PHASES = ("events", "anim", "coins", "weather", "player", "draw", "overlay", "present")
+
+
+class Profiler:
+    def __init__(self, enabled=False, history=600):
+        self.enabled = enabled
+        self.history = deque(maxlen=history)
+        self.current = {}
+        self.frame_start = None  # None - кадр начался при выключенном профилировщике
+        self.last = 0
+        self.csv = None
+
+    def begin_frame(self):
+        # F3 включает замеры посреди кадра; такой кадр не пишем, иначе в него попадёт всё время с запуска
+        self.frame_start = None
+        if self.enabled:
+            self.frame_start = self.last = time.perf_counter()
+            self.current = {}
+
+    def lap(self, name):
+        # время с прошлой отметки записывается на счёт name
+        if self.enabled and self.frame_start is not None:
+            now = time.perf_counter()
+            self.current[name] = self.current.get(name, 0) + now - self.last
+            self.last = now
+
+    def end_frame(self):
+        if self.enabled and self.frame_start is not None:
+            self.current["frame"] = time.perf_counter() - self.frame_start
+            self.history.append(self.current)
+            if self.csv is not None:
+                self.write_row(self.current)
+            return self.current
+        return None
+
+    def stream(self, path):
+        self.close()
+        self.csv = open(path, "w", buffering=64 * 1024)
+        self.csv.write(",".join(("time", "frame") + PHASES) + "\n")
+
+    def write_row(self, sample):
+        row = [f"{time.time():.3f}", f"{sample['frame'] * 1000:.3f}"]
+        row += [f"{sample.get(phase, 0) * 1000:.3f}" for phase in PHASES]
+        self.csv.write(",".join(row) + "\n")
+
+    def close(self):
+        if self.csv is not None:
+            self.csv.close()
+            self.csv = None
+
+    def clear(self):
+        self.history.clear()
+
+
+class StartupTimer:
+    # отметки считаются от started (app.py ставит его до импорта игры)
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks = {}
+
+    def mark(self, name):
+        # отметки ставятся и из фонового прогрева, поэтому в порядке времени, а не вызовов
+        self.marks.setdefault(name, (time.perf_counter() - self.started) * 1000)
+
+    def report(self):
+        marks = sorted(self.marks.items(), key=lambda mark: mark[1])
+        return "startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in marks)
@@ -0,0 +1,42 @@
+import pygame
+
+
+class DirtyRenderer:
+    def __init__(self, screen, enabled=False):
+        self.screen = screen
+        self.enabled = enabled
+        self.rects = []
+        self.prev_rects = []
+        self.full = True
+
+    def mark(self, *rects):
+        for rect in rects:
+            if rect:
+                self.rects.append(pygame.Rect(rect))
+
+    def invalidate(self):
+        self.full = True
+
+    def clear(self, paint, under=None):
+        # paint(area) рисует фон в заданном прямоугольнике экрана, None - весь экран;
+        # under() рисует слой между заливкой и фоном и возвращает его прямоугольник
+        if not self.enabled or self.full:
+            self.screen.fill('black')
+            rect = under() if under else None
+            paint(None)
+            return rect
+        # стираем только то, что было нарисовано в прошлом кадре
+        for rect in self.prev_rects:
+            self.screen.fill('black', rect)
+        rect = under() if under else None
+        for area in self.prev_rects + ([pygame.Rect(rect)] if rect else []):
+            paint(area)
+        return rect
+
+    def present(self):
+        if not self.enabled or self.full:
+            pygame.display.update()
+            self.full = False
+        else:
+            pygame.display.update(self.prev_rects + self.rects)
+        self.prev_rects, self.rects = self.rects, []
@@ -0,0 +1,88 @@
+import os
+import sys
+import zlib
+import struct
+from controls import Controls
+
+MAGIC = b"EERP"
+VERSION = 1
+HEADER = struct.Struct("<4sHQIB")
+REPLAYS_DIR = "data/replays"
+KEEP_REPLAYS = 50
+
+
+def pack_controls(controls):
+    return bool(controls.left) | bool(controls.right) << 1 | bool(controls.jump) << 2
+
+
+def unpack_controls(bits):
+    return Controls(bool(bits & 1), bool(bits & 2), bool(bits & 4))
+
+
+class RecordingInput:
+    def __init__(self, source):
+        self.source = source
+        self.log = bytearray()
+
+    def read(self):
+        controls = self.source.read()
+        self.log.append(pack_controls(controls))
+        return controls
+
+
+class ReplayInput:
+    def __init__(self, log):
+        self.log = log
+        self.tick = 0
+
+    def read(self):
+        bits = self.log[self.tick] if self.tick < len(self.log) else 0
+        self.tick += 1
+        return unpack_controls(bits)
+
+
+class Recording:
+    def __init__(self, level, seed, log=None):
+        self.level = level
+        self.seed = seed
+        self.log = bytearray() if log is None else log
+
+    def save(self, path):
+        name = self.level.encode()
+        data = zlib.compress(bytes(self.log), 9)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as replay:
+            replay.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.log), len(name)) + name + data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as replay:
+            raw = replay.read()
+        magic, version, seed, count, size = HEADER.unpack_from(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: unsupported replay format")
+        name = raw[HEADER.size:HEADER.size + size].decode()
+        log = bytearray(zlib.decompress(raw[HEADER.size + size:]))
+        if len(log) != count:
+            raise ValueError(f"{path}: truncated replay")
+        return cls(name, seed, log)
+
+
+def prune_replays(keep=KEEP_REPLAYS):
+    names = sorted(name for name in os.listdir(REPLAYS_DIR) if name.endswith(".rep"))
+    for name in names[:-keep]:
+        os.remove(os.path.join(REPLAYS_DIR, name))
+
+
+if __name__ == "__main__":
+    from main import Game, RENDER_SIZE
+    from scenes import GameplayScene
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    recording = Recording.load(args[0])
+    if "--fast" in sys.argv:
+        print(Game(RENDER_SIZE, headless=True).simulate(recording.level, ReplayInput(recording.log),
+                                                        seed=recording.seed))
+    else:
+        game = Game(RENDER_SIZE)
+        game.run(GameplayScene(game, recording.level, recording, seek=int(args[1]) if len(args) > 1 else 0))
@@ -0,0 +1,388 @@
+import pygame
+import threading
+from assets import assets
+from button import Button
+from fonts import render_text
+from ui import UI, Label
+from timeline import Timeline
+
+
+class Scene:
+    def __init__(self, game):
+        self.game = game
+        self.screen = game.screen
+        self.width = game.width
+        self.height = game.height
+
+    def enter(self):
+        self.game.renderer.invalidate()
+
+    def resume(self):
+        self.game.renderer.invalidate()
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, dt):
+        pass
+
+    def draw(self):
+        pass
+
+
+class MenuScene(Scene):
+    # кнопки и надписи создаются один раз, экран перерисовывается только при изменениях
+    def __init__(self, game):
+        super().__init__(game)
+        self.ui = UI(game.screen)
+
+    def enter(self):
+        self.ui.invalidate()
+
+    def resume(self):
+        self.ui.invalidate()
+
+    def handle_event(self, event):
+        button = self.ui.handle_event(event)
+        if button is not None:
+            self.game.sound.play("ui_click")
+            self.click(button)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.back()
+
+    def click(self, button):
+        pass
+
+    def back(self):
+        pass
+
+    def paint(self, surface):
+        pass
+
+    def draw(self):
+        self.ui.draw(self.paint)
+
+
+def menu_button(pos, text, size=(184, 56), font_size=75, hovering_color="White"):
+    return Button(image=assets.get("data/sprites/ui/button.png", size), pos=pos, text_input=text,
+                  font_size=font_size, base_color="#d7fcd4", hovering_color=hovering_color)
+
+
+def small_button(pos, text):
+    return Button(image=assets.get("data/sprites/ui/button_small.png", (56, 56)), pos=pos, text_input=text,
+                  font_size=75, base_color="#d7fcd4", hovering_color="White", shiftx=2, shifty=-8)
+
+
+class SplashScene(MenuScene):
+    # лёгкий первый кадр: звуки, спрайты и уровни тем временем грузятся в фоне
+    def __init__(self, game):
+        super().__init__(game)
+        self.warm = threading.Thread(target=game.warm_up, daemon=True)
+        self.ui.add(Label("Loading...", 45, "white", center=(self.width // 2, self.height // 2)))
+
+    def update(self, dt):
+        if self.warm.ident is not None and not self.warm.is_alive():
+            self.game.warmed_up()
+            self.game.replace(MainMenuScene(self.game))
+
+    def draw(self):
+        super().draw()
+        # фон стартует после первого кадра, чтобы не отнимать у него время
+        if self.warm.ident is None:
+            self.game.startup.mark("first frame")
+            self.warm.start()
+            self.game.preloader.start()
+
+    def paint(self, surface):
+        menu_text = render_text("ENIGMA EXIT", 100, "#b68f40")
+        surface.blit(menu_text, menu_text.get_rect(center=(self.width // 2, 100)))
+
+
+class MainMenuScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.play_button = self.ui.add(menu_button((self.width // 2, self.height // 2 - self.height * 0.1), "Play"))
+        self.options_button = self.ui.add(menu_button((self.width // 2, self.height // 2), "Options"))
+        self.help_button = self.ui.add(menu_button((self.width // 2, self.height // 2 + self.height * 0.1), "Help"))
+        self.quit_button = self.ui.add(menu_button((self.width // 2, self.height // 2 + self.height * 0.2), "Quit"))
+
+    def click(self, button):
+        if button is self.play_button:
+            self.game.push(LevelsScene(self.game))
+        elif button is self.options_button:
+            self.game.push(OptionsScene(self.game))
+        elif button is self.help_button:
+            self.game.push(HelpScene(self.game))
+        elif button is self.quit_button:
+            self.game.quit()
+
+    def paint(self, surface):
+        menu_text = render_text("ENIGMA EXIT", 100, "#b68f40")
+        surface.blit(menu_text, menu_text.get_rect(center=(self.width // 2, 100)))
+
+
+class OptionsScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.ui_volume, self.music_volume = game.settings.ui_volume, game.settings.music_volume
+        self.music_label = self.ui.add(Label(str(self.music_volume), 45, "white",
+                                             center=(self.width // 2, self.height // 2 - 100)))
+        self.ui_label = self.ui.add(Label(str(self.ui_volume), 45, "white", center=(self.width // 2, self.height // 2)))
+        self.plus_music_button = self.ui.add(small_button((self.width // 2 + 56, self.height // 2 - 95), "+"))
+        self.minus_music_button = self.ui.add(small_button((self.width // 2 - 56, self.height // 2 - 95), "-"))
+        self.plus_ui_button = self.ui.add(small_button((self.width // 2 + 56, self.height // 2 + 5), "+"))
+        self.minus_ui_button = self.ui.add(small_button((self.width // 2 - 56, self.height // 2 + 5), "-"))
+        self.back_button = self.ui.add(menu_button((self.width // 2, self.height // 2 + self.height * 0.2), "Back"))
+
+    def click(self, button):
+        if button is self.plus_music_button and self.music_volume < 1.0:
+            self.music_volume = float('{:.1f}'.format(self.music_volume + 0.1))
+            self.game.sound.set_volume_music(self.music_volume)
+        elif button is self.minus_music_button and self.music_volume > 0.0:
+            self.music_volume = float('{:.1f}'.format(self.music_volume - 0.1))
+            self.game.sound.set_volume_music(self.music_volume)
+        elif button is self.plus_ui_button and self.ui_volume < 1.0:
+            self.ui_volume = float('{:.1f}'.format(self.ui_volume + 0.1))
+            self.game.sound.set_volume_ui(self.ui_volume)
+        elif button is self.minus_ui_button and self.ui_volume > 0.0:
+            self.ui_volume = float('{:.1f}'.format(self.ui_volume - 0.1))
+            self.game.sound.set_volume_ui(self.ui_volume)
+        elif button is self.back_button:
+            self.back()
+        self.music_label.set_text(str(self.music_volume))
+        self.ui_label.set_text(str(self.ui_volume))
+
+    def back(self):
+        self.game.settings.ui_volume, self.game.settings.music_volume = self.ui_volume, self.music_volume
+        self.game.settings.changed()
+        self.game.pop()
+
+    def paint(self, surface):
+        for text, center in (("Music volume", (self.width // 2 - 200, self.height // 2 - 100)),
+                             ("UI volume", (self.width // 2 - 220, self.height // 2))):
+            label = render_text(text, 60, "white")
+            surface.blit(label, label.get_rect(center=center))
+
+
+class LevelsScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.save = game.save
+        self.loading = None
+        self.loading_label = None
+        self.level_buttons = {}
+        for i, (level, text) in enumerate((("level_0", "level 1"), ("level_1", "level 2"), ("rain", "rain"),
+                                           ("sky", "sky"))):
+            pos = (self.width // 2 - 200, self.height // 2 + self.height * 0.1 * (i - 1))
+            self.level_buttons[level] = self.ui.add(menu_button(pos, text))
+        self.back_button = self.ui.add(menu_button((self.width // 2, self.height // 2 + self.height * 0.3), "Back"))
+        self.reset_button = self.ui.add(menu_button((self.width - 100, 28), "Reset result", (200, 56), 60, "Red"))
+
+    def enter(self):
+        super().enter()
+        self.game.preloader.start()
+
+    def click(self, button):
+        for level, level_button in self.level_buttons.items():
+            if button is level_button:
+                self.loading = level
+        if button is self.reset_button:
+            self.save.reset()
+            self.ui.invalidate()
+        elif button is self.back_button:
+            self.back()
+
+    def back(self):
+        self.game.pop()
+
+    def update(self, dt):
+        if self.loading is None:
+            return
+        if self.game.preloader.is_ready(self.loading):
+            self.game.replace(GameplayScene(self.game, self.loading))
+            return
+        text = f"Loading... {int(self.game.preloader.progress() * 100)}%"
+        if self.loading_label is None:
+            self.loading_label = self.ui.add(Label(text, 45, "white", center=(self.width // 2, self.height - 40)))
+        self.loading_label.set_text(text)
+
+    def paint(self, surface):
+        title = render_text("Select level", 80, "white")
+        surface.blit(title, title.get_rect(center=(self.width // 2, 40)))
+        for i, level in enumerate(self.level_buttons):
+            result = self.save.level(level)
+            score = render_text(f"{result.best}/{result.total}", 80, "white")
+            surface.blit(score, score.get_rect(
+                center=(self.width // 2 - 10, self.height // 2 + self.height * 0.1 * (i - 1) - 10)))
+
+
+class GameplayScene(Scene):
+    def __init__(self, game, level, recording=None, seek=0):
+        super().__init__(game)
+        self.level = level
+        self.recording = recording
+        self.seek = seek
+        self.weather_on = level == "rain"
+
+    def enter(self):
+        if self.recording is None:
+            self.game.start_level(self.level)
+        else:
+            self.game.start_replay(self.recording, self.seek)
+        super().enter()
+        self.game.clock.tick()
+
+    def handle_event(self, event):
+        self.game.handle_event(event)
+
+    def update(self, dt):
+        self.game.advance(self.weather_on, dt)
+
+    def draw(self):
+        self.game.draw(self.weather_on)
+
+
+class RestartScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.restart_button = self.ui.add(
+            menu_button((self.width // 2, self.height // 2 + self.height * 0.2), "Restart"))
+        self.back_button = self.ui.add(
+            menu_button((self.width // 2, self.height // 2 + self.height * 0.35), "Main menu", (220, 56)))
+
+    def click(self, button):
+        if button is self.restart_button:
+            self.game.replace(GameplayScene(self.game, self.game.cur_level))
+        elif button is self.back_button:
+            self.back()
+
+    def back(self):
+        self.game.home()
+
+    def paint(self, surface):
+        text = render_text("GAME OVER.", 45, "white")
+        surface.blit(text, text.get_rect(center=(self.width // 2, self.height // 2)))
+
+
+class WinScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.coin = game.coin
+        self.life = game.player.life
+        self.score = 0
+        rng = game.rng
+        self.pos_rot_coins = [(200 + 22 * i + rng.randint(-7, 7), self.height // 2 - 100 + rng.randint(-4, 4),
+                               rng.randint(-75, 75)) for i in range(self.coin)]
+        self.life_sprite_0 = assets.get("data/sprites/ui/0.png", (64, 56))
+        self.life_sprite_1 = assets.get("data/sprites/ui/1.png", (64, 56))
+        self.score_label = Label("Score: 0", 80, "white", center=(self.width // 2 - 100, 200))
+        self.back_button = menu_button((self.width // 2, self.height // 2 + self.height * 0.2), "Main menu",
+                                       (220, 56))
+
+        # монеты по одной раз в 250 мс, потом жизни раз в 400 мс, потом подсчёт очков
+        self.coins_shown = 0
+        self.lives_shown = 0
+        self.revealed = False
+        self.timeline = Timeline()
+        for i in range(self.coin):
+            self.timeline.after(250 * (i + 1), self.show_coin)
+        for i in range(3):
+            self.timeline.after(250 * self.coin + 400 * (i + 1), self.show_life)
+        self.timeline.after(250 * self.coin + 400 * 3, self.show_results)
+
+    def enter(self):
+        super().enter()
+        if not self.game.replaying:
+            result = self.game.save.level(self.game.cur_level)
+            result.best = max(result.best, (100 * self.coin) * self.life)
+            result.wins += 1
+            self.game.save.changed()
+
+    def show_coin(self):
+        self.coins_shown += 1
+        self.game.sound.play("coin")
+        self.ui.invalidate()
+
+    def show_life(self):
+        self.lives_shown += 1
+        self.ui.invalidate()
+
+    def show_results(self):
+        self.revealed = True
+        self.ui.add(self.score_label)
+        self.ui.add(self.back_button)
+        self.ui.invalidate()
+        steps = self.coin * self.life
+        self.timeline.tween(0, 80 * steps, lambda t: self.count_score(int(t * steps) * 100))
+
+    def count_score(self, score):
+        self.score = score
+        self.score_label.set_text(f"Score: {self.score}")
+
+    def blit_life(self, surface, i):
+        if i <= self.life:
+            surface.blit(self.life_sprite_0, (130 + 70 * i, self.height // 2))
+        else:
+            surface.blit(self.life_sprite_1, (130 + 70 * i, self.height // 2))
+
+    def handle_event(self, event):
+        if not self.revealed and event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+            # нажатие во время показа сразу доигрывает его до конца
+            self.timeline.finish()
+            return
+        super().handle_event(event)
+
+    def click(self, button):
+        if button is self.back_button:
+            self.back()
+
+    def back(self):
+        self.game.home()
+
+    def update(self, dt):
+        self.timeline.update(dt)
+
+    def paint(self, surface):
+        for x, y, r in self.pos_rot_coins[:self.coins_shown]:
+            surface.blit(assets.get("data/sprites/coin/5.png", (64, 64), rotation=r), (x, y))
+        for i in range(1, self.lives_shown + 1):
+            self.blit_life(surface, i)
+        if not self.revealed:
+            return
+
+        text = render_text("WIN.", 60, "white")
+        surface.blit(text, text.get_rect(center=(self.width // 2, self.height // 2)))
+        coin_x = self.pos_rot_coins[-1][0] if self.pos_rot_coins else 200
+        coin_text = render_text(f"x{self.coin}.", 80, "white")
+        surface.blit(coin_text, coin_text.get_rect(topleft=(coin_x + 100, self.height // 2 - 100)))
+        life_text = render_text(f"x{self.life}.", 80, "white")
+        surface.blit(life_text, life_text.get_rect(topleft=(194 + 75 * 3, self.height // 2)))
+
+
+class HelpScene(MenuScene):
+    def __init__(self, game):
+        super().__init__(game)
+        self.github_button = self.ui.add(
+            menu_button((self.width // 2, self.height // 2 + self.height * 0.2), "Github"))
+        self.back_button = self.ui.add(menu_button((self.width // 2, self.height // 2 + self.height * 0.3), "Back"))
+
+    def click(self, button):
+        if button is self.github_button:
+            import webbrowser  # тянет subprocess и прочее, на старте не нужен
+            webbrowser.open("https://github.com/addfd/EnigmaExit")
+        elif button is self.back_button:
+            self.back()
+
+    def back(self):
+        self.game.pop()
+
+    def paint(self, surface):
+        surface.blit(assets.get("data/sprites/ui/ARROWLEFT.png", (64, 64)), (240, 250))
+        surface.blit(assets.get("data/sprites/ui/ARROWRIGHT.png", (64, 64)), (368, 250))
+        surface.blit(assets.get("data/sprites/ui/ARROWUP.png", (64, 64)), (304, 186))
+
+        arrow = render_text(">", 200, "white")
+        for x, path in ((490, "data/sprites/coin/5.png"), (662, "data/sprites/ui/key.png"),
+                        (834, "data/sprites/ui/exit.png")):
+            surface.blit(arrow, arrow.get_rect(center=(x, 225)))
+            surface.blit(assets.get(path, (64, 64)), (x + 50, 225))
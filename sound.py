@@ -1,31 +1,107 @@
+import io
+import os
+import threading
 from pygame import mixer
 from random import randint
 
+MUSIC = ["data/music/afternoonisms.mp3", "data/music/Idiophonix.mp3", "data/music/UnderwaterLevel.mp3"]
+SFX = {"coin": ("data/sounds/coin.wav", 3), "ui_click": ("data/sounds/cursor_sound.wav", 1)}  # путь, максимум голосов
+
 
 class SoundModule:
-    def __init__(self, event_song_end, current_volume):
-        self.list_music = ["data/music/afternoonisms.mp3", "data/music/Bluesy.mp3", "data/music/Idiophonix.mp3",
-                           "data/music/UnderwaterLevel.mp3"]
-        self.cur_track = randint(0, len(self.list_music) - 1)
+    def __init__(self, event_song_end, current_volume, music=True, fade_ms=0, channels=8, preload=True):
+        # битые пути не должны ронять игру на смене трека
+        self.list_music = [path for path in MUSIC if os.path.isfile(path)]
+        self.cur_track = randint(0, len(self.list_music) - 1) if self.list_music else 0
+        self.fade_ms = fade_ms
+        self.music = music
+        self.next_track = None
+        self.loader = None
+        self.playing = None
 
         self.path_to_settings = "data/save/settings.txt"
         self.volume_ui, self.volume_music = current_volume
 
-        self.coin = mixer.Sound("data/sounds/coin.wav")
+        mixer.set_num_channels(channels)
+        self.channels = [mixer.Channel(i) for i in range(channels)]
+        self.started = [0] * channels
+        self.plays = 0
+        self.sounds = {}
+        self.limits = {name: limit for name, (path, limit) in SFX.items()}
+        self.coin = None
+        self.ui_click = None
 
-        self.ui_click = mixer.Sound("data/sounds/cursor_sound.wav")
-        self.set_volume_ui(self.volume_ui)
         mixer.music.set_endevent(event_song_end)
         self.set_volume_music(self.volume_music)
+        if preload:
+            self.load()
+            self.start()
+
+    def load(self, prefetch=False):
+        # можно звать из фонового потока: до конца загрузки play() просто молчит
+        sounds = {name: mixer.Sound(path) for name, (path, limit) in SFX.items()}
+        self.coin = sounds["coin"]
+        self.ui_click = sounds["ui_click"]
+        self.set_volume_ui(self.volume_ui)
+        self.sounds = sounds
+        if prefetch and self.music and self.list_music:
+            self.prefetch(self.cur_track)
+            self.loader.join()
+
+    def start(self):
         self.play_next_track()
 
+    def prefetch(self, index):
+        # файл читается в фоне, в кадре остаётся только разбор заголовка из памяти
+        path = self.list_music[index]
+        self.next_track = None
+
+        def read():
+            with open(path, "rb") as track:
+                self.next_track = (path, track.read())
+
+        self.loader = threading.Thread(target=read, daemon=True)
+        self.loader.start()
+
     def play_next_track(self):
-        mixer.music.load(self.list_music[self.cur_track])
-        mixer.music.play()
+        if not self.music or not self.list_music:
+            return
+        path = self.list_music[self.cur_track]
+        if self.next_track is not None and self.next_track[0] == path:
+            self.playing = io.BytesIO(self.next_track[1])
+            mixer.music.load(self.playing, os.path.splitext(path)[1][1:])
+        else:
+            # фон ещё не успел, читаем с диска как раньше
+            mixer.music.load(path)
+        mixer.music.play(fade_ms=self.fade_ms)
         self.cur_track = (self.cur_track + 1) % len(self.list_music)
+        self.prefetch(self.cur_track)
+
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return None
+        free = None
+        same = []
+        for i, channel in enumerate(self.channels):
+            if channel.get_busy() and channel.get_sound() is sound:
+                same.append(i)
+            elif free is None and not channel.get_busy():
+                free = i
+        if len(same) >= self.limits[name]:
+            # лимит голосов: перезапускаем самый старый из них
+            free = min(same, key=lambda i: self.started[i])
+        if free is None:
+            return None
+        self.plays += 1
+        self.started[free] = self.plays
+        self.channels[free].play(sound)
+        return self.channels[free]
 
     def set_volume_ui(self, volume):
-        self.ui_click.set_volume(volume)
-        
+        self.volume_ui = volume
+        if self.ui_click is not None:
+            self.ui_click.set_volume(volume)
+
     def set_volume_music(self, volume):
         mixer.music.set_volume(volume)
@@ -0,0 +1,149 @@
+import os
+import atexit
+import threading
+
+
+class Store:
+    # файл читается один раз, дальше всё из памяти; запись отложенная и атомарная
+    VERSION = 1
+
+    def __init__(self, path, delay=0.5):
+        self.path = path
+        self.delay = delay  # с
+        self.lock = threading.RLock()
+        self.timer = None
+        self.dirty = False
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as source:
+            lines = [line.strip() for line in source.read().splitlines() if line.strip()]
+        version = 1
+        if lines and lines[0].startswith("version"):
+            version = int(lines.pop(0).replace("=", " ").split()[1])
+        if version > self.VERSION:
+            raise ValueError(f"{self.path}: saved by a newer version ({version})")
+        self.parse(lines, version)
+
+    def changed(self):
+        # несколько изменений подряд дают одну запись
+        with self.lock:
+            self.dirty = True
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            text = "\n".join(self.dump()) + "\n"
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as out:
+                out.write(text)
+                out.flush()
+                os.fsync(out.fileno())
+            # при падении на диске остаётся либо старый файл, либо новый целиком
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def parse(self, lines, version):
+        pass
+
+    def dump(self):
+        return []
+
+
+class Settings(Store):
+    VERSION = 2
+    DEFAULTS = {"ui_volume": 0.5, "music_volume": 0.5, "dirty_rendering": False, "max_fps": 60,
+                "record_replays": True, "profile_csv": "", "music_fade_ms": 0,
+                # окно: scaled - SDL растягивает кадр сам, window - как раньше, один к одному
+                "display": "scaled", "window_scale": 0.0, "integer_scaling": True, "smooth_scaling": False,
+                "vsync": True, "render_preset": "quality"}
+
+    def __init__(self, path, delay=0.5):
+        for name, value in self.DEFAULTS.items():
+            setattr(self, name, value)
+        self.extra = {}
+        super().__init__(path, delay)
+
+    def parse(self, lines, version):
+        for line in lines:
+            name, _, value = line.partition("=")
+            default = self.DEFAULTS.get(name)
+            if default is None:
+                self.extra[name] = value
+            elif isinstance(default, bool):
+                setattr(self, name, value == "1")
+            elif value or isinstance(default, str):
+                setattr(self, name, type(default)(value))
+
+    def dump(self):
+        lines = [f"version={self.VERSION}"]
+        for name, default in self.DEFAULTS.items():
+            value = getattr(self, name)
+            lines.append(f"{name}={int(value) if isinstance(default, bool) else value}")
+        lines += [f"{name}={value}" for name, value in self.extra.items()]
+        return lines
+
+
+class LevelResult:
+    FIELDS = ("best", "total", "wins", "attempts")
+
+    def __init__(self, best=0, total=0, wins=0, attempts=0):
+        self.best = best
+        self.total = total  # максимум очков на уровне
+        self.wins = wins
+        self.attempts = attempts
+        self.extra = {}
+
+
+class SaveData(Store):
+    # v1: "level best total"; v2: "level key=value ..." - новые поля просто дописываются
+    VERSION = 2
+
+    def __init__(self, path, delay=0.5):
+        self.levels = {}
+        super().__init__(path, delay)
+
+    def parse(self, lines, version):
+        for line in lines:
+            name, *values = line.split()
+            if version == 1:
+                self.levels[name] = LevelResult(int(values[0]), int(values[1]))
+                continue
+            result = self.levels[name] = LevelResult()
+            for value in values:
+                key, _, number = value.partition("=")
+                if key in LevelResult.FIELDS:
+                    setattr(result, key, int(number))
+                else:
+                    result.extra[key] = number
+
+    def dump(self):
+        lines = [f"version {self.VERSION}"]
+        for name, result in self.levels.items():
+            fields = [f"{key}={getattr(result, key)}" for key in LevelResult.FIELDS]
+            fields += [f"{key}={value}" for key, value in result.extra.items()]
+            lines.append(" ".join([name] + fields))
+        return lines
+
+    def level(self, name):
+        if name not in self.levels:
+            self.levels[name] = LevelResult()
+        return self.levels[name]
+
+    def reset(self):
+        # как раньше: сбрасывается только рекорд, статистика попыток остаётся
+        for result in self.levels.values():
+            result.best = 0
+        self.changed()
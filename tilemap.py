@@ -0,0 +1,131 @@
+import pygame
+import numpy as np
+from collections import OrderedDict
+
+SOLID = 1
+FIRE = 2
+EXIT = 4
+LAYER_FLAGS = {"ground": SOLID, "fire": FIRE, "exit": EXIT}
+DRAWN_LAYERS = ("ground", "ch", "fire", "exit")
+
+
+class TileMap:
+    def __init__(self, level, tile_size=36, chunk_tiles=8, max_chunks=64, scale=1, transparent=False):
+        self.level = level
+        self.width = level.width
+        self.height = level.height
+        self.tile_size = tile_size
+        # физика всегда в tile_size, картинка кусков может быть мельче (пресет performance)
+        self.draw_size = round(tile_size * scale)
+        # прозрачные куски медленнее, нужны только когда под тайлами идёт дождь
+        self.transparent = transparent
+        self.pixel_width = self.width * tile_size
+        self.pixel_height = self.height * tile_size
+
+        # на клетку один байт с флагами вместо спрайта на каждый тайл
+        flags = np.zeros(self.width * self.height, np.uint8)
+        self.layers = []
+        for layer in level.visible_layers:
+            if layer.name in LAYER_FLAGS:
+                flags[np.frombuffer(layer.data, np.uint32) != 0] |= LAYER_FLAGS[layer.name]
+            if layer.name in DRAWN_LAYERS:
+                self.layers.append(layer.data)
+        self.flags = bytearray(flags.tobytes())
+        self.tile_count = int(np.count_nonzero(flags))
+
+        # карта режется на квадраты, готовые куски хранятся в LRU
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * tile_size
+        self.chunk_cols = -(-self.width // chunk_tiles)
+        self.chunk_rows = -(-self.height // chunk_tiles)
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        self.images = {}
+        self.draw_images = {}
+
+    def cells(self, left, top, right, bottom, flag):
+        # левые верхние углы клеток с флагом, задетых прямоугольником, построчно
+        size = self.tile_size
+        found = []
+        for ty in range(max(0, top // size), min(self.height, (bottom - 1) // size + 1)):
+            row = ty * self.width
+            for tx in range(max(0, left // size), min(self.width, (right - 1) // size + 1)):
+                if self.flags[row + tx] & flag:
+                    found.append((tx * size, ty * size))
+        return found
+
+    def query(self, rect, flag):
+        size = self.tile_size
+        return [pygame.Rect(x, y, size, size) for x, y in self.cells(rect.left, rect.top, rect.right, rect.bottom, flag)]
+
+    def collide(self, rect, flag):
+        return [tile for tile in self.query(rect, flag) if rect.colliderect(tile)]
+
+    def image(self, gid):
+        image = self.images.get(gid)
+        if image is None:
+            image = self.images[gid] = pygame.transform.scale(self.level.tile_image(gid),
+                                                              (self.tile_size, self.tile_size))
+        return image
+
+    def draw_image(self, gid):
+        if self.draw_size == self.tile_size:
+            return self.image(gid)
+        image = self.draw_images.get(gid)
+        if image is None:
+            image = self.draw_images[gid] = pygame.transform.scale(self.level.tile_image(gid),
+                                                                   (self.draw_size, self.draw_size))
+        return image
+
+    def chunk(self, cx, cy):
+        surface = self.chunks.get((cx, cy))
+        if surface is not None:
+            self.chunks.move_to_end((cx, cy))
+            return surface
+
+        size = self.draw_size
+        x0, y0 = cx * self.chunk_tiles, cy * self.chunk_tiles
+        cols = min(self.chunk_tiles, self.width - x0)
+        rows = min(self.chunk_tiles, self.height - y0)
+        if self.transparent:
+            surface = pygame.Surface((cols * size, rows * size), pygame.SRCALPHA).convert_alpha()
+        else:
+            surface = pygame.Surface((cols * size, rows * size)).convert()
+            surface.fill('black')
+        for data in self.layers:
+            blits = []
+            for ty in range(y0, y0 + rows):
+                row = ty * self.width
+                for tx in range(x0, x0 + cols):
+                    gid = data[row + tx]
+                    if gid:
+                        blits.append((self.draw_image(gid), ((tx - x0) * size, (ty - y0) * size)))
+            surface.blits(blits, doreturn=False)
+
+        self.chunks[(cx, cy)] = surface
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surface
+
+    def chunks_in(self, view):
+        size = self.chunk_size
+        for cy in range(max(0, view.top // size), min(self.chunk_rows, (view.bottom - 1) // size + 1)):
+            for cx in range(max(0, view.left // size), min(self.chunk_cols, (view.right - 1) // size + 1)):
+                yield cx, cy
+
+    def prerender(self, view):
+        for cx, cy in self.chunks_in(view):
+            self.chunk(cx, cy)
+
+    def draw(self, screen, offset, area=None):
+        # area в координатах экрана: перерисовать только этот кусок; offset всегда в координатах мира
+        scale, size = self.draw_size, self.tile_size
+        width, height = screen.get_size()
+        view = pygame.Rect(offset, (width * size // scale, height * size // scale)) if area is None else area.move(offset)
+        if area is not None:
+            screen.set_clip(area)
+        for cx, cy in self.chunks_in(view):
+            screen.blit(self.chunk(cx, cy), ((cx * self.chunk_size - offset[0]) * scale // size,
+                                             (cy * self.chunk_size - offset[1]) * scale // size))
+        if area is not None:
+            screen.set_clip(None)
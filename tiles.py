@@ -1,26 +1,27 @@
 import pygame
-from player import load_anim
+from animation import load_clip, anim_clock
+
+COIN_CLIP = ("coin", 6, (32, 32))
 
 
 class Tile(pygame.sprite.Sprite):
     def __init__(self, pos, surf, *groups):
         super().__init__(*groups)
-        self.image = pygame.transform.scale(surf, (36, 36))
+        self.image = surf
         self.rect = self.image.get_rect(topleft=pos)
 
 
 class Coin(pygame.sprite.Sprite):
-    def __init__(self, pos, *groups):
+    def __init__(self, pos, *groups, phase=0):
         super().__init__(*groups)
-        self.frames = load_anim("coin", 6, (32, 32))
-        self.group = groups
-        self.cur_frame = 0
-        self.image = self.frames[self.cur_frame]
-        self.rect = self.image.get_rect(topleft=pos)
+        # кадр берётся из общих часов, своих счётчиков у монеты нет
+        self.clip = load_clip(*COIN_CLIP)
+        self.phase = phase
+        self.rect = self.clip.frame(0).get_rect(topleft=pos)
 
-    def update(self):
-        self.cur_frame = (self.cur_frame + 1) % len(self.frames)
-        self.image = self.frames[self.cur_frame]
+    @property
+    def image(self):
+        return self.clip.frame(anim_clock.frame + self.phase)
 
     def update_collide(self, pl):
         if pygame.sprite.collide_rect(self, pl):
@@ -0,0 +1,48 @@
+class Tween:
+    def __init__(self, start, duration, update):
+        self.start = start
+        self.duration = duration
+        self.update = update
+
+    def progress(self, time):
+        if self.duration <= 0:
+            return 1
+        return min(1, (time - self.start) / self.duration)
+
+
+class Timeline:
+    # время в тех единицах, что приходят в update: тики симуляции или мс
+    def __init__(self):
+        self.time = 0
+        self.tweens = []
+
+    def tween(self, delay, duration, update):
+        # update(t) зовётся каждый кадр с t от 0 до 1, последний вызов всегда с 1
+        tween = Tween(self.time + delay, duration, update)
+        self.tweens.append(tween)
+        self.tweens.sort(key=lambda item: item.start)
+        return tween
+
+    def after(self, delay, callback):
+        return self.tween(delay, 0, lambda t: callback())
+
+    def update(self, dt):
+        self.time += dt
+        for tween in [tween for tween in self.tweens if tween.start <= self.time]:
+            t = tween.progress(self.time)
+            if t >= 1:
+                self.tweens.remove(tween)
+            tween.update(t)
+
+    def finish(self):
+        # доиграть всё сразу, в том числе то, что успеют добавить колбэки
+        while self.tweens:
+            tween = self.tweens.pop(0)
+            self.time = max(self.time, tween.start + tween.duration)
+            tween.update(1)
+
+    def clear(self):
+        self.tweens = []
+
+    def active(self):
+        return bool(self.tweens)
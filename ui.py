@@ -0,0 +1,105 @@
+import pygame
+from button import Button
+from fonts import render_text
+
+
+class Label:
+    def __init__(self, text, size, color, **anchor):
+        self.size = size
+        self.color = color
+        self.anchor = anchor
+        self.text = None
+        self.drawn = None
+        self.set_text(text)
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.surface = render_text(text, self.size, self.color)
+        self.rect = self.surface.get_rect(**self.anchor)
+        self.dirty = True
+
+    @property
+    def area(self):
+        # старый текст тоже нужно стереть
+        return self.rect if self.drawn is None else self.rect.union(self.drawn)
+
+    def update(self, screen):
+        screen.blit(self.surface, self.rect)
+        self.drawn = self.rect
+
+
+class UI:
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.widgets = []
+        self.buttons = []
+        self.focus = None
+        self.full = True
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        if isinstance(widget, Button):
+            self.buttons.append(widget)
+        return widget
+
+    def invalidate(self):
+        self.full = True
+
+    def hover(self, position):
+        for button in self.buttons:
+            button.changeColor(position)
+
+    def move_focus(self, step):
+        if not self.buttons:
+            return
+        if self.focus is None:
+            self.focus = 0 if step > 0 else len(self.buttons) - 1
+        else:
+            self.focus = (self.focus + step) % len(self.buttons)
+        for i, button in enumerate(self.buttons):
+            button.set_state(button.hovered, i == self.focus)
+
+    def handle_event(self, event):
+        # возвращает нажатую кнопку: клик мышью или Enter на кнопке в фокусе
+        if event.type == pygame.MOUSEMOTION:
+            self.hover(event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            for button in self.buttons:
+                if button.checkForInput(event.pos):
+                    return button
+        elif event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_DOWN, pygame.K_TAB):
+                self.move_focus(1)
+            elif event.key == pygame.K_UP:
+                self.move_focus(-1)
+            elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER) and self.focus is not None:
+                return self.buttons[self.focus]
+        return None
+
+    def draw(self, paint):
+        if self.full:
+            # статичная часть экрана рисуется один раз в фон
+            self.background.fill("black")
+            paint(self.background)
+            self.screen.blit(self.background, (0, 0))
+            self.hover(pygame.mouse.get_pos())
+            for widget in self.widgets:
+                widget.update(self.screen)
+                widget.dirty = False
+            pygame.display.update()
+            self.full = False
+            return
+
+        areas = [widget.area for widget in self.widgets if widget.dirty]
+        if not areas:
+            return
+        for area in areas:
+            self.screen.blit(self.background, area, area)
+        for widget in self.widgets:
+            if widget.dirty or widget.area.collidelist(areas) != -1:
+                widget.update(self.screen)
+                widget.dirty = False
+        pygame.display.update(areas)
@@ -1,18 +1,36 @@
+import numpy as np
 import pygame
-from random import randint
 
 
 class Weather:
-    def __init__(self, group, screen, width, height):
-        self.group = group
+    def __init__(self, screen, width, height, density=20, capacity=4096):
         self.screen = screen
         self.width = width
         self.height = height
+        self.density = density
         self.timer = 0
 
+        self.gravity = 0.05
+        self.length = 6
+        self.color = (0, 150, 255)
+        self.rng = np.random.default_rng()
+
+        # кольцевой буфер капель: новые перезаписывают самые старые
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vel_y = np.zeros(capacity, dtype=np.float32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.head = 0
+
     def create_particles(self):
-        for _ in range(20):
-            Rain((randint(0, self.width), randint(-40, -10)), self.screen, self.height, self.group)
+        capacity = len(self.alive)
+        idx = (self.head + np.arange(self.density)) % capacity
+        self.head = (self.head + self.density) % capacity
+
+        self.x[idx] = self.rng.integers(0, self.width, self.density, endpoint=True)
+        self.y[idx] = self.rng.integers(-40, -10, self.density, endpoint=True)
+        self.vel_y[idx] = 1
+        self.alive[idx] = True
 
     def update(self):
         self.timer += 1
@@ -20,23 +38,41 @@ class Weather:
             self.create_particles()
             self.timer = 0
 
+        alive = self.alive
+        self.vel_y[alive] += self.gravity
+        self.y[alive] += self.vel_y[alive]
+        self.alive &= self.y <= self.height
 
-class Rain(pygame.sprite.Sprite):
-    def __init__(self, pos, screen, height, group):
-        super().__init__(group)
-        self.screen = screen
-        self.image = pygame.Surface([1, 5])
-        self.rect = self.image.get_rect()
-        self.height = height
+    def draw(self, alpha=1.0, surface=None, scale=1):
+        # surface и scale - для мира, который рисуется в уменьшенный буфер
+        surface = surface or self.screen
+        idx = np.flatnonzero(self.alive)
+        if not len(idx):
+            return None
 
-        self.velocity = [0, 1]
-        self.rect.x, self.rect.y = pos
+        y = self.y[idx] - self.vel_y[idx] * (1 - alpha)
+        xs = np.repeat(self.x[idx], self.length)
+        ys = (y.astype(np.int32)[:, None] + np.arange(self.length)).ravel()
+        if scale != 1:
+            xs = (xs * scale).astype(np.int32)
+            ys = (ys * scale).astype(np.int32)
+        width, height = surface.get_size()
+        visible = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        if not visible.any():
+            return None
+        xs, ys = xs[visible], ys[visible]
 
-        self.gravity = 0.05
+        pixels = pygame.surfarray.pixels2d(surface)
+        pixels[xs, ys] = surface.map_rgb(self.color)
+        del pixels
+        return pygame.Rect(xs.min(), ys.min(), xs.max() - xs.min() + 1, ys.max() - ys.min() + 1)
 
-    def update(self):
-        self.velocity[1] += self.gravity
-        self.rect.y += self.velocity[1]
-        pygame.draw.line(self.screen, (0, 150, 255), (self.rect.x, self.rect.y), (self.rect.x, self.rect.y + 5))
-        if self.rect.y > self.height:
-            self.kill()
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def clear(self):
+        self.alive[:] = False
+        self.timer = 0
+
+    def count(self):
+        return int(self.alive.sum())